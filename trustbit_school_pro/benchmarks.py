@@ -0,0 +1,59 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import time
+
+import frappe
+from frappe.utils import flt
+
+
+def benchmark_update_collection(distribution=None, runs=5):
+    """Time the collection update of a distribution through a full save and through update_collection.
+
+    Every run collects all pending quantities inside a savepoint that is rolled
+    back, so the distribution is left as it was. Without a distribution the
+    submitted one with the most rows (100-line distributions are typical) is used.
+    Returns the average seconds and write queries per run of each path.
+    """
+    if not distribution:
+        distribution = frappe.db.sql("""
+            SELECT parent
+            FROM `tabBook Sample Distribution Item`
+            WHERE parenttype = 'Book Sample Distribution'
+            AND docstatus = 1
+            GROUP BY parent
+            ORDER BY COUNT(*) DESC
+            LIMIT 1
+        """)[0][0]
+
+    def full_save(dist, items):
+        dist.apply_collection(items)
+        dist.calculate_totals()
+        dist.update_status()
+        dist.save(ignore_permissions=True)
+
+    def lightweight(dist, items):
+        dist.update_collection(items, collection="Benchmark")
+
+    results = {"distribution": distribution}
+    for label, update in (("full_save", full_save), ("update_collection", lightweight)):
+        elapsed = writes = 0
+        for run in range(runs):
+            dist = frappe.get_doc("Book Sample Distribution", distribution)
+            items = [
+                {"distribution_item": item.name, "item_code": item.item_code, "qty_collected": item.qty_pending}
+                for item in dist.items
+                if flt(item.qty_pending) > 0
+            ]
+
+            frappe.db.savepoint("benchmark_update_collection")
+            start_writes = frappe.db.transaction_writes
+            start = time.perf_counter()
+            update(dist, items)
+            elapsed += time.perf_counter() - start
+            writes += frappe.db.transaction_writes - start_writes
+            frappe.db.rollback(save_point="benchmark_update_collection")
+
+        results[label] = {"rows": len(items), "seconds": elapsed / runs, "writes": writes / runs}
+
+    return results
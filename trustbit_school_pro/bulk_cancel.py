@@ -0,0 +1,115 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+# Dependents are cancelled before the documents they refer to
+CANCEL_ORDER = ("Book Sample Collection", "Book Sample Distribution", "Book Sample Loading")
+
+
+@frappe.whitelist()
+def bulk_cancel(doctype, names, amend=0):
+    """Queue cancellation of sample documents together with their submitted dependents"""
+    if doctype not in CANCEL_ORDER:
+        frappe.throw(_("Bulk cancel is not available for {0}").format(doctype))
+
+    names = frappe.parse_json(names)
+    for name in names:
+        if not frappe.has_permission(doctype, "cancel", name):
+            frappe.throw(_("Not permitted to cancel {0} {1}").format(doctype, name), frappe.PermissionError)
+
+    frappe.enqueue(
+        "trustbit_school_pro.bulk_cancel.cancel_documents",
+        queue="long",
+        timeout=3600,
+        doctype=doctype,
+        names=names,
+        amend=cint(amend),
+    )
+    frappe.msgprint(_("Cancellation of {0} documents has been queued").format(len(names)))
+
+
+def cancel_documents(doctype, names, amend=0):
+    """Cancel documents in dependency order, committing each one on its own.
+
+    Stock Entries are cancelled by the documents' on_cancel, and each one
+    queues its own Repost Item Valuation in ERPNext as usual. When amend is
+    set, a draft amendment is created for each of the selected documents.
+    """
+    documents = get_documents_to_cancel(doctype, names)
+    summary = {"cancelled": [], "amended": [], "errors": []}
+
+    for i, (ref_doctype, name) in enumerate(documents):
+        try:
+            doc = frappe.get_doc(ref_doctype, name)
+            doc.cancel()
+
+            if amend and ref_doctype == doctype:
+                summary["amended"].append(make_amendment(doc).name)
+
+            frappe.db.commit()
+            summary["cancelled"].append(name)
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=_("Bulk cancel of {0} failed").format(name))
+            summary["errors"].append(f"{name}: {frappe.get_traceback().strip().splitlines()[-1]}")
+
+        frappe.publish_progress(
+            (i + 1) * 100 / len(documents),
+            title=_("Cancelling Sample Documents"),
+            description=_("{0} of {1} documents processed").format(i + 1, len(documents)),
+        )
+
+    # Only starts ERPNext's repost job now instead of at its next scheduled run;
+    # the queued reposts are processed as they are, not merged
+    if summary["cancelled"]:
+        frappe.enqueue(
+            "erpnext.stock.doctype.repost_item_valuation.repost_item_valuation.repost_entries",
+            queue="long",
+            job_id="trustbit_bulk_cancel_repost",
+            deduplicate=True,
+        )
+
+    frappe.publish_realtime("sample_bulk_cancel_complete", summary, user=frappe.session.user)
+    return summary
+
+
+def make_amendment(doc):
+    """Insert a draft amendment of a cancelled document"""
+    amended = frappe.copy_doc(doc)
+    amended.amended_from = doc.name
+    amended.status = "Draft"
+
+    # Stock Entries belong to the cancelled document only
+    for fieldname in ("stock_entry", "stock_entry_damaged"):
+        if amended.meta.has_field(fieldname):
+            amended.set(fieldname, None)
+
+    amended.insert()
+    return amended
+
+
+def get_documents_to_cancel(doctype, names):
+    """Get (doctype, name) of the selected documents and their dependents in cancel order"""
+    selected = {ref_doctype: [] for ref_doctype in CANCEL_ORDER}
+    selected[doctype] = frappe.get_all(
+        doctype, filters={"name": ("in", names), "docstatus": 1}, pluck="name"
+    )
+
+    if selected["Book Sample Loading"]:
+        selected["Book Sample Distribution"] += frappe.get_all(
+            "Book Sample Distribution",
+            filters={"loading_reference": ("in", selected["Book Sample Loading"]), "docstatus": 1},
+            pluck="name",
+        )
+
+    if selected["Book Sample Distribution"]:
+        selected["Book Sample Collection"] += frappe.get_all(
+            "Book Sample Collection",
+            filters={"distribution_reference": ("in", selected["Book Sample Distribution"]), "docstatus": 1},
+            pluck="name",
+        )
+
+    return [(ref_doctype, name) for ref_doctype in CANCEL_ORDER for name in selected[ref_doctype]]
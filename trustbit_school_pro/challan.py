@@ -0,0 +1,123 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import io
+
+import frappe
+from frappe import _
+from frappe.utils import now_datetime
+
+from trustbit_school_pro.metrics import record_cache_lookup
+
+CHALLAN_PRINT_FORMAT = "Book Sample Challan"
+CHALLAN_CACHE_KEY = "trustbit_challan_pdf"
+CHALLAN_CACHE_EXPIRY = 7 * 24 * 60 * 60
+
+# The print format uses a few Bootstrap classes that the print view would provide
+CHALLAN_BASE_STYLE = """
+body { font-family: sans-serif; }
+.table { width: 100%; border-collapse: collapse; margin-bottom: 10px; }
+.table-bordered th, .table-bordered td { border: 1px solid #444; padding: 4px 6px; }
+.text-right { text-align: right; }
+.text-center { text-align: center; }
+"""
+
+
+@frappe.whitelist()
+def print_challans(names):
+    """Queue a merged challan PDF for the selected distributions"""
+    names = frappe.parse_json(names)
+    for name in names:
+        if not frappe.has_permission("Book Sample Distribution", "print", name):
+            frappe.throw(
+                _("Not permitted to print Book Sample Distribution {0}").format(name), frappe.PermissionError
+            )
+
+    frappe.enqueue(
+        "trustbit_school_pro.challan.make_challan_pdf",
+        queue="long",
+        timeout=1800,
+        names=names,
+    )
+    frappe.msgprint(_("Challans are being generated. You will be notified when the PDF is ready."))
+
+
+def make_challan_pdf(names):
+    """Render the challans of distributions into one PDF File and notify the user.
+
+    The print format is compiled once for the whole batch, and each challan's
+    PDF is cached against the distribution's modified timestamp so reprints
+    of unchanged documents skip rendering.
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    print_format = frappe.get_cached_doc("Print Format", CHALLAN_PRINT_FORMAT)
+    template = frappe.get_jenv().from_string(print_format.html)
+    style = CHALLAN_BASE_STYLE + (print_format.css or "")
+    options = {
+        f"margin-{side}": f"{print_format.get(f'margin_{side}') or 15}mm"
+        for side in ("top", "bottom", "left", "right")
+    }
+
+    modified = dict(frappe.get_all(
+        "Book Sample Distribution",
+        filters={"name": ("in", names)},
+        fields=["name", "modified"],
+        as_list=True,
+    ))
+
+    writer = PdfWriter()
+    for i, name in enumerate(names):
+        if name not in modified:
+            continue
+
+        pdf = get_challan_pdf(name, modified[name], template, style, options)
+        writer.append_pages_from_reader(PdfReader(io.BytesIO(pdf)))
+
+        frappe.publish_progress(
+            (i + 1) * 100 / len(names),
+            title=_("Printing Challans"),
+            description=_("{0} of {1} challans rendered").format(i + 1, len(names)),
+        )
+
+    output = io.BytesIO()
+    writer.write(output)
+
+    file = frappe.get_doc({
+        "doctype": "File",
+        "file_name": f"challans-{now_datetime().strftime('%Y%m%d-%H%M%S')}.pdf",
+        "is_private": 1,
+        "content": output.getvalue(),
+    })
+    file.insert(ignore_permissions=True)
+    frappe.db.commit()
+
+    frappe.publish_realtime(
+        "challan_pdf_ready",
+        {"file_url": file.file_url, "count": len(modified)},
+        user=frappe.session.user,
+    )
+    return file.file_url
+
+
+def get_challan_pdf(name, modified, template, style, options):
+    """Get a distribution's challan PDF from cache, rendering it if the document changed"""
+    from frappe.utils.pdf import get_pdf
+
+    cache_key = f"{CHALLAN_CACHE_KEY}:{name}"
+    cached = frappe.cache().get_value(cache_key)
+    hit = bool(cached and cached.get("modified") == str(modified))
+    record_cache_lookup("challan_pdf", hit)
+    if hit:
+        return cached["pdf"]
+
+    doc = frappe.get_doc("Book Sample Distribution", name)
+    html = f"""<!DOCTYPE html>
+        <html><head><meta charset="utf-8"><style>{style}</style></head>
+        <body><div class="print-format">{template.render(doc=doc)}</div></body></html>"""
+    pdf = get_pdf(html, options)
+
+    frappe.cache().set_value(
+        cache_key, {"modified": str(modified), "pdf": pdf}, expires_in_sec=CHALLAN_CACHE_EXPIRY
+    )
+    return pdf
@@ -0,0 +1,196 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import sys
+
+import click
+import frappe
+from frappe.commands import pass_context
+from frappe.exceptions import SiteNotSpecifiedError
+
+
+@click.command("reconcile-books-on-board")
+@click.option("--vehicle", help="Only reconcile this vehicle")
+@pass_context
+def reconcile_books_on_board(context, vehicle=None):
+    """Reset each vehicle's cached books on board from its warehouse Bin"""
+    from trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle import (
+        reconcile_books_on_board,
+    )
+
+    if not context.sites:
+        raise SiteNotSpecifiedError
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            mismatches = reconcile_books_on_board(vehicle)
+            frappe.db.commit()
+
+            for row in mismatches:
+                click.echo(
+                    f"{site}: {row.vehicle} books on board {row.books_on_board} -> {row.actual_qty}"
+                )
+            click.echo(f"{site}: {len(mismatches)} vehicle(s) reconciled")
+        finally:
+            frappe.destroy()
+
+
+@click.command("archive-sample-season")
+@click.argument("season")
+@pass_context
+def archive_sample_season(context, season):
+    """Move closed sample documents of a season (Fiscal Year) into the archive tables"""
+    from trustbit_school_pro.trustbit_school_pro.doctype.book_sample_archive.book_sample_archive import (
+        archive_closed_season,
+    )
+
+    if not context.sites:
+        raise SiteNotSpecifiedError
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            archived = archive_closed_season(season)
+            for doctype, count in archived.items():
+                click.echo(f"{site}: {count} {doctype} archived")
+        finally:
+            frappe.destroy()
+
+
+@click.command("reconcile-collected-qty")
+@click.option("--processes", default=4, type=int, help="Number of worker processes")
+@click.option("--fix", is_flag=True, default=False, help="Write the expected quantities back")
+@pass_context
+def reconcile_collected_qty(context, processes=4, fix=False):
+    """Check distribution collected quantities against submitted collections"""
+    from trustbit_school_pro.reconciliation import reconcile_collected_qty
+
+    if not context.sites:
+        raise SiteNotSpecifiedError
+
+    for site in context.sites:
+        mismatches, unlinked = reconcile_collected_qty(site, processes=processes, fix=fix)
+
+        for row in mismatches:
+            click.echo(
+                f"{site}: {row['parent']} {row['item_code']} ({row['name']}) "
+                f"qty_collected {row['qty_collected']} -> {row['expected_qty']}"
+            )
+        for name in unlinked:
+            click.echo(f"{site}: {name} has no distribution reference")
+
+        click.echo(
+            f"{site}: {len(mismatches)} mismatched row(s) {'fixed' if fix else 'found'}, "
+            f"{len(unlinked)} collection(s) without distribution reference"
+        )
+
+
+@click.command("benchmark-collection-update")
+@click.option("--distribution", help="Submitted distribution to benchmark, the largest one by default")
+@click.option("--runs", default=5, type=int, help="Number of runs per path")
+@pass_context
+def benchmark_collection_update(context, distribution=None, runs=5):
+    """Compare a full distribution save with the lightweight collection update"""
+    from trustbit_school_pro.benchmarks import benchmark_update_collection
+
+    if not context.sites:
+        raise SiteNotSpecifiedError
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            results = benchmark_update_collection(distribution, runs=runs)
+            for path in ("full_save", "update_collection"):
+                result = results[path]
+                click.echo(
+                    f"{site}: {results['distribution']} {path}: {result['rows']} row(s), "
+                    f"{result['seconds'] * 1000:.1f} ms, {result['writes']:.0f} write(s) per run"
+                )
+        finally:
+            frappe.destroy()
+
+
+@click.command("send-overdue-reminders")
+@click.option("--now", is_flag=True, default=False, help="Flush the email queue instead of waiting for the scheduler")
+@pass_context
+def send_overdue_reminders(context, now=False):
+    """Queue the daily overdue sample reminders to schools.
+
+    With --now the queued emails are sent straight away, which makes it easy
+    to check delivery against a local SMTP stub such as
+    `python -m aiosmtpd -n -l localhost:1025` set up as the outgoing Email Account.
+    """
+    from frappe.email.queue import flush
+
+    from trustbit_school_pro.tasks import send_overdue_reminders
+
+    if not context.sites:
+        raise SiteNotSpecifiedError
+
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            send_overdue_reminders()
+            frappe.db.commit()
+
+            if now:
+                flush()
+            click.echo(f"{site}: overdue reminders queued")
+        finally:
+            frappe.destroy()
+
+
+@click.command("check-query-plans")
+@click.option("--max-ratio", default=50, type=int, help="Rows examined allowed per row returned")
+@click.option("--verbose", is_flag=True, default=False, help="Print the plan of every query, not only failures")
+@pass_context
+def check_query_plans(context, max_ratio=50, verbose=False):
+    """Analyze the app's hand-written SQL on a seeded site and fail on lost indexes or large scans"""
+    from trustbit_school_pro.query_plans import check_query_plans
+
+    if not context.sites:
+        raise SiteNotSpecifiedError
+
+    failed = 0
+    for site in context.sites:
+        frappe.init(site=site)
+        frappe.connect()
+        try:
+            for result in check_query_plans(max_ratio=max_ratio):
+                if result.get("skipped"):
+                    click.echo(f"{site}: {result.method} skipped, no sample data")
+                    continue
+
+                if result.problems:
+                    failed += 1
+
+                if result.problems or verbose:
+                    click.echo(f"{site}: {result.get('caller') or result.method}: {result.get('query', '')[:120]}")
+                    for table in result.get("tables", []):
+                        click.echo(
+                            f"    {table.alias}: {table.access_type} on {table.key or '-'}, "
+                            f"{table.rows_examined:.0f} row(s) read"
+                        )
+                    for problem in result.problems:
+                        click.echo(f"    FAIL {problem}")
+        finally:
+            frappe.destroy()
+
+    if failed:
+        click.echo(f"{failed} query plan(s) failed")
+        sys.exit(1)
+
+
+commands = [
+    reconcile_books_on_board,
+    archive_sample_season,
+    reconcile_collected_qty,
+    benchmark_collection_update,
+    send_overdue_reminders,
+    check_query_plans,
+]
@@ -11,6 +11,24 @@ doc_events = {
     "Vehicle": {
         "after_insert": "trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle.create_vehicle_warehouse",
     },
+    "Book Sample Loading": {
+        "after_insert": "trustbit_school_pro.profiling.save_pending_profiles",
+    },
+    "Book Sample Distribution": {
+        "after_insert": "trustbit_school_pro.profiling.save_pending_profiles",
+    },
+    "Book Sample Collection": {
+        "after_insert": "trustbit_school_pro.profiling.save_pending_profiles",
+    },
+    "Warehouse": {
+        "on_update": "trustbit_school_pro.trustbit_school_pro.doctype.school_pro_settings.school_pro_settings.clear_field_warehouse_cache",
+        "after_rename": "trustbit_school_pro.trustbit_school_pro.doctype.school_pro_settings.school_pro_settings.clear_field_warehouse_cache",
+        "on_trash": "trustbit_school_pro.trustbit_school_pro.doctype.school_pro_settings.school_pro_settings.clear_field_warehouse_cache",
+    },
+    "Stock Entry": {
+        "on_submit": "trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle.publish_vehicle_stock_update",
+        "on_cancel": "trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle.publish_vehicle_stock_update",
+    },
 }
 
 # Fixtures - Custom Fields for Stock Entry linking
@@ -40,7 +58,7 @@ Custom Fields for Item:
 
 # Include js, css files in header of desk
 app_include_css = "/assets/trustbit_school_pro/css/trustbit_school_pro.css"
-app_include_js = "/assets/trustbit_school_pro/js/trustbit_school_pro.js"
+# Sample form helpers (public/js/sample_forms.bundle.js) are loaded by the forms with frappe.require
 
 # Desk Notifications
 # notification_config = "trustbit_school_pro.notifications.get_notification_config"
@@ -53,8 +71,11 @@ after_install = "trustbit_school_pro.install.after_install"
 before_uninstall = "trustbit_school_pro.uninstall.before_uninstall"
 
 # Scheduled Tasks
-# scheduler_events = {
-#     "daily": [
-#         "trustbit_school_pro.tasks.daily"
-#     ],
-# }
+scheduler_events = {
+    "hourly": [
+        "trustbit_school_pro.trustbit_school_pro.doctype.book_sample_stock_reservation.book_sample_stock_reservation.purge_expired_reservations"
+    ],
+    "daily": [
+        "trustbit_school_pro.tasks.send_overdue_reminders"
+    ],
+}
@@ -6,7 +6,9 @@ def after_install():
     """Run after app installation"""
     create_default_class_grades()
     create_item_custom_fields()
+    create_item_search_indexes()
     create_sample_warehouse()
+    set_default_field_warehouse()
     frappe.db.commit()
 
 
@@ -35,6 +37,7 @@ def create_item_custom_fields():
                 "fieldtype": "Data",
                 "insert_after": "book_sample_section",
                 "depends_on": "eval:doc.custom_is_sample_book",
+                "search_index": 1,
             },
             {
                 "fieldname": "custom_class_grades",
@@ -79,6 +82,7 @@ def create_item_custom_fields():
                 "options": "Supplier",
                 "insert_after": "custom_isbn",
                 "depends_on": "eval:doc.custom_is_sample_book",
+                "search_index": 1,
             },
         ]
     }
@@ -86,6 +90,20 @@ def create_item_custom_fields():
     frappe.msgprint("Custom fields for Item master created successfully!")
 
 
+def create_item_search_indexes():
+    """Create the indexes used by the sample book search query"""
+    # Sample books in name order, for searches without text and the final sort
+    frappe.db.add_index("Item", ["custom_is_sample_book", "disabled", "item_name"], "sample_book_index")
+
+    if frappe.db.has_index("tabItem", "sample_book_search"):
+        return
+
+    frappe.db.sql_ddl("""
+        ALTER TABLE `tabItem`
+        ADD FULLTEXT INDEX `sample_book_search` (item_name, custom_subject, custom_author)
+    """)
+
+
 def create_sample_warehouse():
     """Create default 'Samples in Field' warehouse"""
     if not frappe.db.exists("Warehouse", {"warehouse_name": "Samples in Field"}):
@@ -106,6 +124,16 @@ def create_sample_warehouse():
             frappe.msgprint(f"'Samples in Field' warehouse created for {company}")
 
 
+def set_default_field_warehouse():
+    """Make 'Samples in Field' the default field warehouse in School Pro Settings"""
+    if frappe.db.get_single_value("School Pro Settings", "field_warehouse"):
+        return
+
+    warehouse = frappe.db.get_value("Warehouse", {"warehouse_name": "Samples in Field", "is_group": 0})
+    if warehouse:
+        frappe.db.set_single_value("School Pro Settings", "field_warehouse", warehouse)
+
+
 def create_default_class_grades():
     """Create default class grades"""
     default_grades = [
@@ -0,0 +1,221 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import heapq
+from collections import defaultdict
+
+import frappe
+from frappe.utils import flt
+
+from trustbit_school_pro.trustbit_school_pro.doctype.book_sample_archive.book_sample_archive import (
+    get_archived_ledger_entries,
+)
+
+# Document lines every ledger report reads. Each report picks the voucher
+# types it shows and the column their qty goes to.
+LEDGER_SOURCES = (
+    {
+        "voucher_type": "Book Sample Loading",
+        "parent_table": "tabBook Sample Loading",
+        "parent": "bsl",
+        "child_table": "tabBook Sample Loading Item",
+        "child": "bsli",
+        "date": "bsl.loading_date",
+        "school": None,
+        "party": "bsl.loader_name",
+        "qty": "bsli.qty",
+        "warehouse": "bsl.source_warehouse",
+        "conditions": "",
+    },
+    {
+        "voucher_type": "Book Sample Distribution",
+        "parent_table": "tabBook Sample Distribution",
+        "parent": "bsd",
+        "child_table": "tabBook Sample Distribution Item",
+        "child": "bsdi",
+        "date": "bsd.distribution_date",
+        "school": "bsd.school",
+        "party": "bsd.distributor_name",
+        "qty": "bsdi.qty",
+        "warehouse": "bsd.source_warehouse",
+        "conditions": "",
+    },
+    {
+        "voucher_type": "Book Sample Collection",
+        "parent_table": "tabBook Sample Collection",
+        "parent": "bsc",
+        "child_table": "tabBook Sample Collection Item",
+        "child": "bsci",
+        "date": "bsc.collection_date",
+        "school": "bsc.school",
+        "party": "bsc.collector_name",
+        "qty": "bsci.qty_collected",
+        "warehouse": "bsc.target_warehouse",
+        "conditions": "AND bsci.qty_collected > 0",
+    },
+)
+
+# Archive entry columns the ledger's order_by fields are sorted on
+ARCHIVED_ORDER_COLUMNS = {
+    "date": "ae.posting_date",
+    "school": "ae.school",
+    "voucher_no": "ae.voucher_no",
+}
+
+# Archive entry column holding the qty of each archived voucher type
+ARCHIVED_QTY_FIELDS = {
+    "Book Sample Loading": "qty_loaded",
+    "Book Sample Distribution": "qty_distributed",
+    "Book Sample Collection": "qty_collected",
+}
+
+
+def get_ledger_entries(ledger, filters):
+    """Get the rows of a ledger report with a running balance.
+
+    ledger configures the report:
+    - qty_fields: column the qty of each shown voucher type goes to
+    - signs: how each qty column moves the balance
+    - balance_key: fields the running balance is kept per
+    - order_by: sort fields, every source is sorted by them in the database
+    - party_field: column for the loader, distributor or collector name
+    - area_zone: join School for its area/zone column and filter
+    - required_fields: fields archived rows must have to be shown
+
+    Every source comes back sorted, so the sources are merged with a k-way
+    heap merge instead of being concatenated and sorted again. Archived rows
+    go first among rows that sort equal, as they come from earlier seasons.
+    Sources are sorted byte-wise, not by the case-insensitive collation, so
+    the database and the merge agree on the order of "abc" and "Bright".
+    """
+    filters = frappe._dict(filters or {})
+    streams = [get_archived_entries(ledger, filters)]
+    streams.extend(
+        get_source_entries(source, ledger, filters)
+        for source in LEDGER_SOURCES
+        if source["voucher_type"] in ledger["qty_fields"]
+    )
+
+    balances = defaultdict(float)
+    data = []
+    for row in heapq.merge(*streams, key=get_sort_key(ledger["order_by"])):
+        key = tuple(row.get(field) for field in ledger["balance_key"])
+        balances[key] += sum(flt(row.get(field)) * sign for field, sign in ledger["signs"].items())
+        row.balance = balances[key]
+        data.append(row)
+
+    return data
+
+
+def get_source_entries(source, ledger, filters):
+    """Lines of one document type, sorted like the ledger and mapped to its columns"""
+    qty_field = ledger["qty_fields"][source["voucher_type"]]
+    has_school = bool(ledger.get("area_zone") and source["school"])
+
+    rows = frappe.db.sql("""
+        SELECT
+            {date} as date,
+            '{voucher_type}' as voucher_type,
+            {parent}.name as voucher_no,
+            {child}.item_code,
+            {child}.item_name,
+            {child}.class_grade,
+            {school} as school,
+            {parent}.vehicle,
+            {party} as party_name,
+            {qty} as qty,
+            {warehouse} as warehouse,
+            {area_zone} as area_zone
+        FROM `{parent_table}` {parent}
+        INNER JOIN `{child_table}` {child} ON {child}.parent = {parent}.name
+        {school_join}
+        WHERE {parent}.docstatus = 1
+        {source_conditions}
+        {conditions}
+        ORDER BY {order_by}, {child}.idx
+    """.format(
+        date=source["date"],
+        voucher_type=source["voucher_type"],
+        parent=source["parent"],
+        parent_table=source["parent_table"],
+        child=source["child"],
+        child_table=source["child_table"],
+        school=source["school"] or "NULL",
+        party=source["party"],
+        qty=source["qty"],
+        warehouse=source["warehouse"],
+        area_zone="s.area_zone" if has_school else "NULL",
+        school_join=f"INNER JOIN `tabSchool` s ON s.name = {source['school']}" if has_school else "",
+        source_conditions=source["conditions"],
+        conditions=get_source_conditions(source, ledger, filters),
+        order_by=get_order_by(ledger, {
+            "date": source["date"],
+            "school": source["school"] or "NULL",
+            "voucher_no": f"{source['parent']}.name",
+        }),
+    ), filters, as_dict=True)
+
+    for row in rows:
+        set_qty_fields(row, ledger, {qty_field: flt(row.pop("qty"))})
+        yield row
+
+
+def get_archived_entries(ledger, filters):
+    """Archived season rows in ledger order, mapped to the ledger's qty columns"""
+    order_by = get_order_by(ledger, ARCHIVED_ORDER_COLUMNS)
+    for row in get_archived_ledger_entries(filters, order_by=order_by):
+        if any(not row.get(field) for field in ledger.get("required_fields", ())):
+            continue
+
+        qty = {}
+        for voucher_type, field in ledger["qty_fields"].items():
+            qty[field] = qty.get(field, 0.0) + flt(row.get(ARCHIVED_QTY_FIELDS[voucher_type]))
+
+        if any(qty.values()):
+            set_qty_fields(row, ledger, qty)
+            yield row
+
+
+def set_qty_fields(row, ledger, qty):
+    for field in set(ledger["qty_fields"].values()):
+        row[field] = qty.get(field, 0.0)
+
+    if ledger.get("party_field"):
+        row[ledger["party_field"]] = row.party_name
+
+
+def get_source_conditions(source, ledger, filters):
+    conditions = []
+
+    if filters.get("from_date"):
+        conditions.append(f"AND {source['date']} >= %(from_date)s")
+
+    if filters.get("to_date"):
+        conditions.append(f"AND {source['date']} <= %(to_date)s")
+
+    if filters.get("item_code"):
+        conditions.append(f"AND {source['child']}.item_code = %(item_code)s")
+
+    if filters.get("vehicle"):
+        conditions.append(f"AND {source['parent']}.vehicle = %(vehicle)s")
+
+    if filters.get("school") and source["school"]:
+        conditions.append(f"AND {source['school']} = %(school)s")
+
+    if filters.get("area_zone") and ledger.get("area_zone") and source["school"]:
+        conditions.append("AND s.area_zone = %(area_zone)s")
+
+    return " ".join(conditions)
+
+
+def get_order_by(ledger, columns):
+    # UTF-8 bytes sort like Python compares str, by code point; dates sort alike as text
+    return ", ".join(f"BINARY {columns[field]}" for field in ledger["order_by"])
+
+
+def get_sort_key(fields):
+    # Empty values sort first, as NULLs do in the database
+    def sort_key(row):
+        return tuple((row.get(field) is not None, row.get(field)) for field in fields)
+
+    return sort_key
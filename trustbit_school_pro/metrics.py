@@ -0,0 +1,176 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import functools
+import time
+from contextlib import contextmanager
+
+import frappe
+
+METRICS_CACHE_KEY = "trustbit_metrics"
+
+# Upper bounds in seconds of the duration histogram buckets
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+METRICS = {
+    "trustbit_sample_submit_duration_seconds": (
+        "histogram", "Time taken by on_submit of sample documents"
+    ),
+    "trustbit_sample_cancel_duration_seconds": (
+        "histogram", "Time taken by on_cancel of sample documents"
+    ),
+    "trustbit_stock_entry_duration_seconds": (
+        "histogram", "Time taken to create and submit the Stock Entry of a sample document"
+    ),
+    "trustbit_report_duration_seconds": (
+        "histogram", "Time taken to run a sample report"
+    ),
+    "trustbit_cache_requests_total": (
+        "counter", "Lookups of app caches by cache and result"
+    ),
+}
+
+
+def inc_counter(metric, value=1, **labels):
+    """Add to a counter; errors are logged so metrics never break the operation"""
+    try:
+        cache = frappe.cache()
+        cache.hincrbyfloat(cache.make_key(METRICS_CACHE_KEY), get_series(metric, labels), value)
+    except Exception:
+        frappe.logger("trustbit_metrics").exception(f"Could not update {metric}")
+
+
+def observe(metric, seconds, **labels):
+    """Record a duration in a histogram with one Redis round trip.
+
+    Buckets are stored cumulatively, as Prometheus expects them, so the
+    endpoint only has to read them back.
+    """
+    try:
+        cache = frappe.cache()
+        key = cache.make_key(METRICS_CACHE_KEY)
+        pipeline = cache.pipeline(transaction=False)
+        for bound in DURATION_BUCKETS:
+            # Adding 0 still creates the bucket, so every series exposes all of them
+            pipeline.hincrby(key, get_series(f"{metric}_bucket", dict(labels, le=str(bound))), int(seconds <= bound))
+        pipeline.hincrby(key, get_series(f"{metric}_bucket", dict(labels, le="+Inf")), 1)
+        pipeline.hincrby(key, get_series(f"{metric}_count", labels), 1)
+        pipeline.hincrbyfloat(key, get_series(f"{metric}_sum", labels), seconds)
+        pipeline.execute()
+    except Exception:
+        frappe.logger("trustbit_metrics").exception(f"Could not update {metric}")
+
+
+def timed(metric, **labels):
+    """Decorator observing the run time of a function in a histogram"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with observe_duration(metric, **labels):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def timed_doc_method(metric):
+    """Decorator observing the run time of a Document method, labelled with the doctype"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(doc, *args, **kwargs):
+            with observe_duration(metric, doctype=doc.doctype):
+                return method(doc, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def observe_duration(metric, **labels):
+    """Observe the run time of a block, with a status label of ok or error.
+
+    Runs under the sample profiler are left out, cProfile slows them down
+    several times over.
+    """
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        if not frappe.flags.in_sample_profile:
+            observe(metric, time.perf_counter() - start, status=status, **labels)
+
+
+def record_cache_lookup(cache, hit):
+    inc_counter("trustbit_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def get_series(metric, labels):
+    if not labels:
+        return metric
+
+    return "{0}{{{1}}}".format(metric, ",".join(
+        '{0}="{1}"'.format(
+            label, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+        for label, value in sorted(labels.items(), key=lambda label: (label[0] == "le", label[0]))
+    ))
+
+
+@frappe.whitelist()
+def metrics():
+    """Serve all metrics in the Prometheus text format.
+
+    Scrape /api/method/trustbit_school_pro.metrics.metrics with the API key
+    of a System Manager in the Authorization header.
+    """
+    from werkzeug.wrappers import Response
+
+    frappe.only_for("System Manager")
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4", charset="utf-8")
+
+
+def render_metrics():
+    cache = frappe.cache()
+    # Raw HGETALL, the cache's own hgetall expects pickled values
+    values = {
+        frappe.safe_decode(series): frappe.safe_decode(value)
+        for series, value in (cache.execute_command("HGETALL", cache.make_key(METRICS_CACHE_KEY)) or {}).items()
+    }
+
+    series_by_metric = {}
+    for series, value in values.items():
+        name = series.split("{", 1)[0]
+        for suffix in ("_bucket", "_count", "_sum"):
+            if name.endswith(suffix) and name[: -len(suffix)] in METRICS:
+                name = name[: -len(suffix)]
+                break
+        series_by_metric.setdefault(name, []).append((series, value))
+
+    lines = []
+    for metric, (metric_type, description) in METRICS.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for series, value in sorted(series_by_metric.get(metric, []), key=get_sort_key):
+            lines.append(f"{series} {format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def get_sort_key(item):
+    # Keep a histogram's buckets in bound order, le is always the last label
+    series = item[0]
+    if 'le="' not in series:
+        return (series, 0)
+
+    prefix, bound = series.rsplit('le="', 1)
+    bound = bound.split('"', 1)[0]
+    return (prefix, float("inf") if bound == "+Inf" else float(bound))
+
+
+def format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
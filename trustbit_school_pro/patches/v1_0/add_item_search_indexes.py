@@ -0,0 +1,7 @@
+from trustbit_school_pro.install import create_item_custom_fields, create_item_search_indexes
+
+
+def execute():
+    # Re-sync Item custom fields so search_index is applied on existing sites
+    create_item_custom_fields()
+    create_item_search_indexes()
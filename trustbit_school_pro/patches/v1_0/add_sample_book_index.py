@@ -0,0 +1,5 @@
+from trustbit_school_pro.install import create_item_search_indexes
+
+
+def execute():
+    create_item_search_indexes()
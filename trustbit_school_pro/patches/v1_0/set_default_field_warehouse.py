@@ -0,0 +1,6 @@
+from trustbit_school_pro.install import set_default_field_warehouse
+
+
+def execute():
+    # Existing sites keep distributing into their single 'Samples in Field' warehouse
+    set_default_field_warehouse()
@@ -0,0 +1,19 @@
+import frappe
+
+
+def execute():
+    # Only books listed once on their distribution can be linked to a row unambiguously
+    frappe.db.sql("""
+        UPDATE `tabBook Sample Collection Item` bsci
+        INNER JOIN `tabBook Sample Collection` bsc ON bsc.name = bsci.parent
+        INNER JOIN (
+            SELECT parent, item_code, MIN(name) as name
+            FROM `tabBook Sample Distribution Item`
+            WHERE parenttype = 'Book Sample Distribution'
+            GROUP BY parent, item_code
+            HAVING COUNT(*) = 1
+        ) bsdi ON bsdi.parent = bsc.distribution_reference AND bsdi.item_code = bsci.item_code
+        SET bsci.distribution_item = bsdi.name
+        WHERE bsci.parenttype = 'Book Sample Collection'
+        AND IFNULL(bsci.distribution_item, '') = ''
+    """)
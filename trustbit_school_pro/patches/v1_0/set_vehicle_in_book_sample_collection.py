@@ -0,0 +1,12 @@
+import frappe
+
+
+def execute():
+    # Collections take the van of their distribution, or of the distribution's loading
+    frappe.db.sql("""
+        UPDATE `tabBook Sample Collection` bsc
+        INNER JOIN `tabBook Sample Distribution` bsd ON bsd.name = bsc.distribution_reference
+        LEFT JOIN `tabBook Sample Loading` bsl ON bsl.name = bsd.loading_reference
+        SET bsc.vehicle = COALESCE(NULLIF(bsd.vehicle, ''), bsl.vehicle)
+        WHERE IFNULL(bsc.vehicle, '') = ''
+    """)
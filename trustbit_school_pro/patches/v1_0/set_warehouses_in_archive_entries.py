@@ -0,0 +1,15 @@
+import frappe
+
+
+def execute():
+    # Lines archived before the entries kept both warehouses, read them from the archived document
+    frappe.db.sql("""
+        UPDATE `tabBook Sample Archive Entry` ae
+        INNER JOIN `tabBook Sample Archive` a ON a.name = ae.voucher_no
+        SET
+            ae.source_warehouse = JSON_VALUE(a.document, '$.source_warehouse'),
+            ae.target_warehouse = JSON_VALUE(a.document, '$.target_warehouse')
+        WHERE ae.is_balance = 0
+        AND ae.source_warehouse IS NULL
+        AND ae.target_warehouse IS NULL
+    """)
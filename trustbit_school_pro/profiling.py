@@ -0,0 +1,111 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import cProfile
+import functools
+import io
+import marshal
+import pstats
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import now_datetime
+
+# Functions listed in the summary comment
+PROFILE_SUMMARY_LIMIT = 25
+
+
+def profile_lifecycle(method):
+    """Run a document method under cProfile when sample profiling is on for the site or user.
+
+    Profiling is switched on with sample_profiling in site config, or for some
+    users with a sample_profiling_users list. Both are read from the in-memory
+    site config, so a method runs unwrapped when profiling is off.
+    """
+    @functools.wraps(method)
+    def wrapper(doc, *args, **kwargs):
+        if not is_profiling_enabled() or frappe.flags.in_sample_profile:
+            return method(doc, *args, **kwargs)
+
+        return run_profiled(method, doc, *args, **kwargs)
+
+    return wrapper
+
+
+def is_profiling_enabled():
+    conf = frappe.conf
+    return bool(
+        conf.get("sample_profiling")
+        or (conf.get("sample_profiling_users") and frappe.session.user in conf.sample_profiling_users)
+    )
+
+
+def run_profiled(method, doc, *args, **kwargs):
+    profiler = cProfile.Profile()
+    frappe.flags.in_sample_profile = True
+    start = time.perf_counter()
+    try:
+        return profiler.runcall(method, doc, *args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - start
+        frappe.flags.in_sample_profile = False
+        if doc.is_new() and not frappe.db.exists(doc.doctype, doc.name):
+            # validate of a new document runs before it is inserted; on_submit of an inserted one after
+            doc.flags.pending_profiles = (doc.flags.pending_profiles or []) + [(method.__name__, profiler, elapsed)]
+        else:
+            attach_profile(doc, method.__name__, profiler, elapsed)
+
+
+def save_pending_profiles(doc, method=None):
+    """Attach the profiles taken before the document was inserted, run on after_insert"""
+    for method_name, profiler, elapsed in doc.flags.pop("pending_profiles", None) or []:
+        attach_profile(doc, method_name, profiler, elapsed)
+
+
+def attach_profile(doc, method_name, profiler, elapsed):
+    try:
+        save_profile(doc, method_name, profiler, elapsed)
+    except Exception:
+        frappe.log_error(title=_("Saving profile of {0} {1} failed").format(doc.doctype, doc.name))
+
+
+def save_profile(doc, method_name, profiler, elapsed):
+    """Attach the profile to the document as a .prof File and comment a summary of it"""
+    profiler.create_stats()
+    stats = pstats.Stats(profiler)
+    sql_calls, sql_time = get_sql_stats(stats)
+
+    file = frappe.get_doc({
+        "doctype": "File",
+        "file_name": f"{doc.name}-{method_name}-{now_datetime().strftime('%Y%m%d-%H%M%S')}.prof",
+        "attached_to_doctype": doc.doctype,
+        "attached_to_name": doc.name,
+        "is_private": 1,
+        # Same format as cProfile's dump_stats, readable by pstats and snakeviz
+        "content": marshal.dumps(profiler.stats),
+    })
+    file.insert(ignore_permissions=True)
+
+    output = io.StringIO()
+    stats.stream = output
+    stats.sort_stats("cumulative").print_stats(PROFILE_SUMMARY_LIMIT)
+
+    doc.add_comment("Info", _("Profiled {0}: {1:.3f}s, {2} SQL queries taking {3:.3f}s. {4}").format(
+        method_name,
+        elapsed,
+        sql_calls,
+        sql_time,
+        f'<a href="{file.file_url}">{file.file_name}</a><pre>{frappe.utils.escape_html(output.getvalue())}</pre>',
+    ))
+
+
+def get_sql_stats(stats):
+    """Calls to and cumulative time of Database.sql in a profile"""
+    calls = elapsed = 0
+    for (filename, lineno, function), (cc, ncalls, tt, ct, callers) in stats.stats.items():
+        if function == "sql" and filename.replace("\\", "/").endswith("frappe/database/database.py"):
+            calls += ncalls
+            elapsed += ct
+
+    return calls, elapsed
@@ -0,0 +1,294 @@
+// Copyright (c) 2024, Trustbit Software and contributors
+// For license information, please see license.txt
+
+// Helpers shared by the sample forms, lists and reports.
+// Loaded on demand with frappe.require('sample_forms.bundle.js').
+
+frappe.provide("trustbit_school_pro");
+
+// Utility functions for the app
+trustbit_school_pro.utils = {
+    // Format quantity with color based on pending status
+    format_qty_status: function(qty_pending, qty_total) {
+        if (qty_pending <= 0) {
+            return `<span class="text-success">${qty_pending}</span>`;
+        } else if (qty_pending < qty_total) {
+            return `<span class="text-warning">${qty_pending}</span>`;
+        } else {
+            return `<span class="text-danger">${qty_pending}</span>`;
+        }
+    },
+
+    // Check if date is overdue
+    is_overdue: function(date) {
+        if (!date) return false;
+        return frappe.datetime.get_diff(date, frappe.datetime.get_today()) < 0;
+    },
+
+    // Get status color
+    get_status_color: function(status) {
+        const colors = {
+            'Draft': 'orange',
+            'Loaded': 'blue',
+            'In Transit': 'purple',
+            'Returned': 'green',
+            'Distributed': 'blue',
+            'Partially Collected': 'yellow',
+            'Fully Collected': 'green',
+            'Collected': 'green',
+            'Pending': 'orange',
+            'Partial': 'yellow',
+            'Cancelled': 'red'
+        };
+        return colors[status] || 'gray';
+    }
+};
+
+// Live van stock: snapshot once, then apply pushed deltas
+trustbit_school_pro.van_stock = {
+    watchers: {},
+
+    // Watch a vehicle's stock; on_change receives the full item list after every update
+    watch: function(vehicle, on_change) {
+        let me = this;
+        let stock = {};
+
+        frappe.call({
+            method: 'trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle.get_vehicle_stock',
+            args: { vehicle: vehicle },
+            callback: function(r) {
+                (r.message || []).forEach(row => stock[row.item_code] = row);
+                me.watchers[vehicle] = { stock: stock, on_change: on_change };
+                frappe.realtime.doc_subscribe('Vehicle', vehicle);
+                on_change(me.get_items(vehicle));
+            }
+        });
+
+        if (!me.listening) {
+            me.listening = true;
+            frappe.realtime.on('vehicle_stock_update', data => me.apply_update(data));
+        }
+    },
+
+    unwatch: function(vehicle) {
+        delete this.watchers[vehicle];
+        frappe.realtime.doc_unsubscribe('Vehicle', vehicle);
+    },
+
+    apply_update: function(data) {
+        let watcher = this.watchers[data.vehicle];
+        if (!watcher) return;
+
+        data.items.forEach(function(delta) {
+            let row = watcher.stock[delta.item_code];
+            if (!row) {
+                row = watcher.stock[delta.item_code] = Object.assign({}, delta, { actual_qty: 0 });
+            }
+            row.actual_qty = flt(row.actual_qty) + flt(delta.actual_qty);
+            if (row.actual_qty <= 0) {
+                delete watcher.stock[delta.item_code];
+            }
+        });
+        watcher.on_change(this.get_items(data.vehicle));
+    },
+
+    get_items: function(vehicle) {
+        let stock = this.watchers[vehicle].stock;
+        return Object.keys(stock).sort().map(item_code => stock[item_code]);
+    }
+};
+
+// Bulk cancel of sample documents from their list views
+trustbit_school_pro.bulk_cancel = {
+    setup: function(listview) {
+        listview.page.add_action_item(__('Cancel with Dependents'), function() {
+            let names = listview.get_checked_items(true);
+            if (!names.length) {
+                frappe.msgprint(__('Please select at least one document'));
+                return;
+            }
+            trustbit_school_pro.bulk_cancel.confirm(listview, names);
+        });
+    },
+
+    confirm: function(listview, names) {
+        let d = new frappe.ui.Dialog({
+            title: __('Cancel {0} Documents', [names.length]),
+            fields: [
+                {
+                    fieldname: 'info',
+                    fieldtype: 'HTML',
+                    options: `<p>${__('Submitted collections and distributions made from the selected documents are cancelled first, along with their Stock Entries.')}</p>`
+                },
+                {
+                    fieldname: 'amend',
+                    fieldtype: 'Check',
+                    label: __('Create Amended Drafts')
+                }
+            ],
+            primary_action_label: __('Cancel Documents'),
+            primary_action: function(values) {
+                frappe.call({
+                    method: 'trustbit_school_pro.bulk_cancel.bulk_cancel',
+                    args: { doctype: listview.doctype, names: names, amend: values.amend },
+                    callback: function() {
+                        d.hide();
+                    }
+                });
+            }
+        });
+
+        frappe.realtime.off('sample_bulk_cancel_complete');
+        frappe.realtime.on('sample_bulk_cancel_complete', function(summary) {
+            let message = __('{0} documents cancelled, {1} amended drafts created', [summary.cancelled.length, summary.amended.length]);
+            if (summary.errors.length) {
+                message += '<br><br>' + summary.errors.slice(0, 50).map(frappe.utils.escape_html).join('<br>');
+            }
+            frappe.msgprint({ title: __('Bulk Cancel'), message: message, indicator: summary.errors.length ? 'orange' : 'green' });
+            listview.refresh();
+        });
+
+        d.show();
+    }
+};
+
+// Sample document forms: item search, class grade picker and batched row details
+trustbit_school_pro.sample_forms = {
+    DETAILS_DELAY: 300,
+    AVAILABLE_QTY_FIELDS: ['available_qty', 'available_qty_in_van'],
+
+    set_item_query: function(frm) {
+        // Search sample books by subject, class, publisher, author or ISBN, limited to stock in source warehouse
+        frm.set_query('item_code', 'items', function(doc) {
+            return {
+                query: 'trustbit_school_pro.queries.sample_book_query',
+                filters: { warehouse: doc.source_warehouse }
+            };
+        });
+    },
+
+    // Fill details of pasted or uploaded rows with one server call
+    add_enrich_button: function(frm) {
+        if (frm.doc.docstatus !== 0) return;
+
+        frm.add_custom_button(__('Fill Book Details'), function() {
+            frm.call({ method: 'enrich_items', doc: frm.doc, freeze: true }).then(function() {
+                frm.refresh_field('items');
+                frm.dirty();
+            });
+        });
+    },
+
+    // Queue a row for a details fetch; rows queued within DETAILS_DELAY go out in one request
+    queue_item_details: function(frm, cdt, cdn, set_class_grade) {
+        let queue = frm.__item_details_queue = frm.__item_details_queue || {};
+        let entry = queue[cdn] || { cdt: cdt, set_class_grade: false };
+        entry.set_class_grade = entry.set_class_grade || !!set_class_grade;
+        queue[cdn] = entry;
+
+        clearTimeout(frm.__item_details_timer);
+        frm.__item_details_timer = setTimeout(() => this.fetch_item_details(frm), this.DETAILS_DELAY);
+    },
+
+    // Refresh the available qty of every row, e.g. after the source warehouse changes
+    refresh_available_qty: function(frm) {
+        (frm.doc.items || []).forEach(row => {
+            if (row.item_code) {
+                this.queue_item_details(frm, row.doctype, row.name, false);
+            }
+        });
+    },
+
+    fetch_item_details: function(frm) {
+        let queue = frm.__item_details_queue || {};
+        frm.__item_details_queue = {};
+
+        let rows = Object.keys(queue)
+            .map(cdn => Object.assign({ row: locals[queue[cdn].cdt][cdn] }, queue[cdn]))
+            .filter(entry => entry.row && entry.row.item_code);
+        if (!rows.length) return;
+
+        frappe.call({
+            method: 'trustbit_school_pro.trustbit_school_pro.doctype.book_sample_loading.book_sample_loading.get_sample_item_details',
+            args: {
+                item_codes: [...new Set(rows.map(entry => entry.row.item_code))],
+                warehouse: frm.doc.source_warehouse
+            },
+            callback: r => {
+                let details = r.message || {};
+                let qty_field = this.AVAILABLE_QTY_FIELDS.find(field => frappe.meta.has_field(rows[0].cdt, field));
+                let changed = false;
+
+                rows.forEach(function(entry) {
+                    let item = details[entry.row.item_code];
+                    if (!item) return;
+
+                    // Assigned directly: set_value would run the class_grade handler and open its picker
+                    if (entry.set_class_grade && entry.row.class_grade !== (item.class_grade || '')) {
+                        entry.row.class_grade = item.class_grade || '';
+                        changed = true;
+                    }
+                    if (qty_field && frm.doc.source_warehouse) {
+                        entry.row[qty_field] = item.available_qty;
+                    }
+                });
+                frm.refresh_field('items');
+                if (changed) frm.dirty();
+            }
+        });
+    },
+
+    show_class_grade_dialog: function(frm, cdt, cdn) {
+        let row = locals[cdt][cdn];
+        let current_values = row.class_grade ? row.class_grade.split(', ').map(v => v.trim()) : [];
+
+        // Fetch all class grades
+        frappe.call({
+            method: 'frappe.client.get_list',
+            args: {
+                doctype: 'Class Grade',
+                filters: { is_active: 1 },
+                fields: ['name', 'class_order'],
+                limit_page_length: 0
+            },
+            callback: function(r) {
+                if (r.message) {
+                    // Sort by class_order
+                    let sorted = r.message.sort((a, b) => (a.class_order || 0) - (b.class_order || 0));
+
+                    // Build HTML checkboxes
+                    let html = '<div class="class-grade-grid" style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 10px;">';
+                    sorted.forEach(function(cg) {
+                        let checked = current_values.includes(cg.name) ? 'checked' : '';
+                        html += `<label style="display: flex; align-items: center; cursor: pointer;">
+                            <input type="checkbox" class="class-grade-checkbox" value="${cg.name}" ${checked} style="margin-right: 8px;">
+                            ${cg.name}
+                        </label>`;
+                    });
+                    html += '</div>';
+
+                    let d = new frappe.ui.Dialog({
+                        title: __('Select Class/Grade'),
+                        fields: [
+                            {
+                                fieldname: 'class_grades_html',
+                                fieldtype: 'HTML',
+                                options: html
+                            }
+                        ],
+                        primary_action_label: __('Select'),
+                        primary_action: function() {
+                            let selected = [];
+                            d.$wrapper.find('.class-grade-checkbox:checked').each(function() {
+                                selected.push($(this).val());
+                            });
+                            frappe.model.set_value(cdt, cdn, 'class_grade', selected.join(', '));
+                            d.hide();
+                        }
+                    });
+                    d.show();
+                }
+            }
+        });
+    }
+};
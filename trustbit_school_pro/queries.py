@@ -0,0 +1,104 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import re
+
+import frappe
+from frappe.utils import cint
+
+
+@frappe.whitelist()
+@frappe.validate_and_sanitize_search_inputs
+def sample_book_query(doctype, txt, searchfield, start, page_len, filters):
+    """Search sample books for the item_code field of the sample item tables.
+
+    Matches code, name, subject, author, ISBN, publisher and class grade.
+    When a warehouse is passed in filters only books in stock there are returned.
+    """
+    filters = filters or {}
+    values = {"start": cint(start), "page_len": cint(page_len) or 20}
+    conditions = []
+
+    stock_join = ""
+    stock_column = "NULL"
+    if filters.get("warehouse"):
+        # Drive the search from the warehouse's Bin rows so only stocked titles are scanned
+        stock_join = """
+            INNER JOIN `tabBin` b ON b.item_code = i.name
+                AND b.warehouse = %(warehouse)s
+                AND b.actual_qty > 0
+        """
+        stock_column = "b.actual_qty"
+        values["warehouse"] = filters.get("warehouse")
+
+    if filters.get("subject"):
+        conditions.append("AND i.custom_subject = %(subject)s")
+        values["subject"] = filters.get("subject")
+
+    if filters.get("publisher"):
+        conditions.append("AND i.custom_publisher = %(publisher)s")
+        values["publisher"] = filters.get("publisher")
+
+    if filters.get("class_grade"):
+        conditions.append("""AND EXISTS (
+            SELECT 1 FROM `tabItem Class Grade` icg
+            WHERE icg.parent = i.name AND icg.parenttype = 'Item'
+            AND icg.class_grade = %(class_grade)s
+        )""")
+        values["class_grade"] = filters.get("class_grade")
+
+    search_join = ""
+    if txt:
+        # Each match runs as its own UNION branch so every one can use its index;
+        # OR-ed together, the FULLTEXT match would force a scan of Item
+        search_join = """
+            INNER JOIN ({0}) m ON m.name = i.name
+        """.format(" UNION ".join(get_search_queries(txt, values)))
+
+    return frappe.db.sql("""
+        SELECT
+            i.name,
+            i.item_name,
+            i.custom_subject,
+            i.custom_author,
+            i.custom_isbn,
+            {stock_column} as available_qty
+        FROM `tabItem` i
+        {search_join}
+        {stock_join}
+        WHERE i.custom_is_sample_book = 1
+        AND i.disabled = 0
+        {conditions}
+        ORDER BY i.item_name
+        LIMIT %(start)s, %(page_len)s
+    """.format(
+        stock_column=stock_column,
+        search_join=search_join,
+        stock_join=stock_join,
+        conditions=" ".join(conditions),
+    ), values)
+
+
+def get_search_queries(txt, values):
+    """Build one query per match on the search text, each returning matching item names"""
+    values["prefix"] = f"{txt}%"
+    search_queries = [
+        "SELECT i.name FROM `tabItem` i WHERE i.name LIKE %(prefix)s",
+        "SELECT i.name FROM `tabItem` i WHERE i.custom_isbn LIKE %(prefix)s",
+        "SELECT i.name FROM `tabItem` i WHERE i.custom_publisher LIKE %(prefix)s",
+        """SELECT icg.parent FROM `tabItem Class Grade` icg
+            WHERE icg.class_grade LIKE %(prefix)s AND icg.parenttype = 'Item'""",
+    ]
+
+    # FULLTEXT ignores words shorter than innodb_ft_min_token_size (3 by default)
+    words = [word for word in re.split(r"[^\w]+", txt) if len(word) >= 3]
+    if words:
+        values["fulltext"] = " ".join(f"+{word}*" for word in words)
+        search_queries.append("""SELECT i.name FROM `tabItem` i
+            WHERE MATCH(i.item_name, i.custom_subject, i.custom_author) AGAINST (%(fulltext)s IN BOOLEAN MODE)""")
+    else:
+        values["txt"] = f"%{txt}%"
+        search_queries.append("SELECT i.name FROM `tabItem` i WHERE i.item_name LIKE %(txt)s")
+        search_queries.append("SELECT i.name FROM `tabItem` i WHERE i.custom_subject LIKE %(prefix)s")
+
+    return search_queries
@@ -0,0 +1,256 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import json
+import sys
+from contextlib import contextmanager
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, cint, flt, getdate
+
+from trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle import VEHICLE_STOCK_CACHE_KEY
+
+APP_MODULE = "trustbit_school_pro"
+DOCTYPE = "trustbit_school_pro.trustbit_school_pro.doctype"
+REPORT = "trustbit_school_pro.trustbit_school_pro.report"
+
+# Rows a query may read beyond max_ratio per returned row before it is flagged
+MIN_ROWS_EXAMINED = 1000
+
+# Hand-written queries to check. Each entry calls an app function with
+# arguments taken from the site's data; "indexes" maps a table alias to the
+# keys the optimizer is expected to pick for it. Aggregating queries return
+# few rows by design and skip the ratio check with max_ratio None.
+QUERY_CHECKS = (
+    {
+        "method": f"{DOCTYPE}.school.school.get_pending_samples",
+        "args": lambda s: {"school": s.school},
+        "indexes": {"bsd": ("school",), "bsdi": ("parent",)},
+    },
+    {
+        "method": f"{DOCTYPE}.vehicle.vehicle.get_vehicle_stock",
+        "args": lambda s: {"vehicle": s.vehicle},
+        "before": lambda s: frappe.cache().hdel(VEHICLE_STOCK_CACHE_KEY, s.warehouse),
+        "indexes": {},
+    },
+    {
+        "method": f"{DOCTYPE}.book_sample_loading.book_sample_loading.get_items_for_vehicle",
+        "args": lambda s: {"vehicle": s.vehicle},
+        "indexes": {"i": ("PRIMARY",)},
+    },
+    {
+        "method": f"{DOCTYPE}.book_sample_loading.book_sample_loading.get_sample_item_details",
+        "args": lambda s: {"item_codes": [s.item_code], "warehouse": s.warehouse},
+        "indexes": {"i": ("PRIMARY",), "icg": ("parent",)},
+    },
+    {
+        "method": f"{DOCTYPE}.book_sample_loading.book_sample_loading.get_books_by_class",
+        "args": lambda s: {"class_grades": [s.class_grade], "warehouse": s.warehouse} if s.class_grade else None,
+        "indexes": {"icg": ("class_grade_parent_index",), "i": ("PRIMARY",)},
+        "max_ratio": None,
+    },
+    {
+        "method": f"{DOCTYPE}.book_sample_distribution.book_sample_distribution.get_items_from_loading",
+        "args": lambda s: {"loading": s.loading} if s.loading else None,
+        "indexes": {
+            "bsli": ("parent",),
+            "bsd": ("loading_reference",),
+            "bsc": ("distribution_reference",),
+            "bsci": ("parent",),
+        },
+        "max_ratio": None,
+    },
+    {
+        "method": f"{DOCTYPE}.book_sample_distribution.book_sample_distribution.get_pending_distributions_for_school",
+        "args": lambda s: {"school": s.school},
+        "indexes": {"bsd": ("school",)},
+    },
+    {
+        "method": f"{REPORT}.pending_sample_collection.pending_sample_collection.execute",
+        "args": lambda s: {"filters": {"school": s.school}},
+        "indexes": {"bsd": ("school", "docstatus_status_index"), "bsdi": ("parent",)},
+    },
+    {
+        "method": f"{REPORT}.school_sample_ledger.school_sample_ledger.execute",
+        "args": lambda s: {"filters": {"school": s.school, "from_date": s.from_date, "to_date": s.to_date}},
+        "indexes": {"bsd": ("school",), "bsc": ("school",), "bsdi": ("parent",), "bsci": ("parent",)},
+    },
+    {
+        "method": f"{REPORT}.vehicle_sample_ledger.vehicle_sample_ledger.execute",
+        "args": lambda s: {"filters": {"vehicle": s.vehicle, "from_date": s.from_date, "to_date": s.to_date}},
+        "indexes": {"bsl": ("vehicle",), "bsd": ("vehicle",), "bsc": ("vehicle",)},
+    },
+    {
+        "method": f"{REPORT}.book_sample_ledger.book_sample_ledger.execute",
+        "args": lambda s: {"filters": {"item_code": s.item_code, "from_date": s.from_date, "to_date": s.to_date}},
+        "indexes": {"bsli": ("item_code",), "bsdi": ("item_code",), "bsci": ("item_code",)},
+    },
+    {
+        "method": f"{REPORT}.van_stock_reconciliation.van_stock_reconciliation.execute",
+        "args": lambda s: {"filters": {"vehicle": s.vehicle}},
+        "indexes": {"v": ("PRIMARY",)},
+        "max_ratio": None,
+    },
+    {
+        "method": f"{REPORT}.sample_collection_plan.sample_collection_plan.execute",
+        "args": lambda s: {"filters": {"area_zone": s.area_zone}},
+        "indexes": {"bsd": ("docstatus_status_index", "PRIMARY"), "bsdi": ("parent",)},
+        "max_ratio": None,
+    },
+)
+
+
+def check_query_plans(max_ratio=50):
+    """Run every checked function against the site's data and analyze the raw SQL it issues.
+
+    Each SELECT the app writes by hand is run again under ANALYZE FORMAT=JSON.
+    A query fails when a table alias uses none of its expected indexes, when a
+    full scan reads more than MIN_ROWS_EXAMINED rows, or when it examines more
+    than max_ratio rows per row returned. Returns the analyzed queries with
+    their problems.
+    """
+    sample = get_sample_args()
+    results = []
+
+    for check in QUERY_CHECKS:
+        kwargs = check["args"](sample)
+        if kwargs is None:
+            results.append(frappe._dict({"method": check["method"], "skipped": True, "problems": []}))
+            continue
+
+        if check.get("before"):
+            check["before"](sample)
+
+        try:
+            with capture_app_selects() as queries:
+                frappe.get_attr(check["method"])(**kwargs)
+        except Exception:
+            results.append(frappe._dict({
+                "method": check["method"],
+                "problems": [frappe.get_traceback().strip().splitlines()[-1]],
+            }))
+            continue
+
+        ratio = check.get("max_ratio", max_ratio)
+        for query in queries:
+            result = analyze_query(query, check["indexes"], ratio)
+            result.method = check["method"]
+            results.append(result)
+
+    return results
+
+
+def get_sample_args():
+    """Pick a recent submitted distribution and the school, van, loading and book it involves"""
+    sample = frappe.db.sql("""
+        SELECT
+            bsd.name as distribution,
+            bsd.school,
+            bsd.vehicle,
+            bsd.loading_reference as loading,
+            bsd.distribution_date,
+            bsdi.item_code,
+            s.area_zone,
+            v.warehouse
+        FROM `tabBook Sample Distribution` bsd
+        INNER JOIN `tabBook Sample Distribution Item` bsdi ON bsdi.parent = bsd.name
+        INNER JOIN `tabSchool` s ON s.name = bsd.school
+        LEFT JOIN `tabVehicle` v ON v.name = bsd.vehicle
+        WHERE bsd.docstatus = 1
+        ORDER BY IFNULL(bsd.loading_reference, '') = '', bsd.modified DESC
+        LIMIT 1
+    """, as_dict=True)
+
+    if not sample:
+        frappe.throw(_("Query plans need a site with submitted Book Sample Distributions"))
+
+    sample = sample[0]
+    sample.class_grade = frappe.db.get_value(
+        "Item Class Grade", {"parent": sample.item_code, "parenttype": "Item"}, "class_grade"
+    )
+    sample.from_date = add_days(getdate(sample.distribution_date), -365)
+    sample.to_date = add_days(getdate(sample.distribution_date), 365)
+    return sample
+
+
+@contextmanager
+def capture_app_selects():
+    """Record the SELECTs called directly from app code, with the rows each returned"""
+    queries = []
+    sql = frappe.db.sql
+
+    def capture(query, values=(), *args, **kwargs):
+        result = sql(query, values, *args, **kwargs)
+        caller = sys._getframe(1).f_globals.get("__name__", "")
+        if caller.startswith(APP_MODULE) and caller != __name__ and query.lstrip().upper().startswith("SELECT"):
+            queries.append(frappe._dict({
+                "caller": caller,
+                "query": query,
+                "values": values,
+                "rows": len(result or ()),
+            }))
+        return result
+
+    frappe.db.sql = capture
+    try:
+        yield queries
+    finally:
+        frappe.db.sql = sql
+
+
+def analyze_query(query, indexes, max_ratio=None):
+    """Run a captured query under ANALYZE FORMAT=JSON and check its table accesses"""
+    plan = json.loads(frappe.db.sql("ANALYZE FORMAT=JSON " + query.query, query.values)[0][0])
+    tables = list(get_table_accesses(plan))
+
+    problems = []
+    rows_examined = 0
+    for table in tables:
+        rows_examined += table.rows_examined
+
+        expected = indexes.get(table.alias)
+        if expected and table.key not in expected:
+            problems.append(
+                f"{table.alias} uses {table.key or 'no index'} ({table.access_type}), expected {' or '.join(expected)}"
+            )
+        elif table.access_type == "ALL" and table.rows_examined > MIN_ROWS_EXAMINED:
+            problems.append(f"{table.alias} full scan reads {table.rows_examined:.0f} rows")
+
+    if max_ratio and rows_examined > max(query.rows, 1) * max_ratio + MIN_ROWS_EXAMINED:
+        problems.append(f"examines {rows_examined:.0f} rows for {query.rows} returned")
+
+    return frappe._dict({
+        "caller": query.caller,
+        "query": " ".join(query.query.split()),
+        "rows": query.rows,
+        "rows_examined": rows_examined,
+        "tables": tables,
+        "problems": problems,
+    })
+
+
+def get_table_accesses(node):
+    """Yield every table read in a MariaDB JSON plan, derived tables and subqueries included"""
+    if isinstance(node, list):
+        for child in node:
+            yield from get_table_accesses(child)
+        return
+
+    if not isinstance(node, dict):
+        return
+
+    table = node.get("table")
+    if isinstance(table, dict) and table.get("table_name"):
+        alias = table["table_name"]
+        if not alias.startswith("<"):
+            yield frappe._dict({
+                "alias": alias,
+                "access_type": table.get("access_type"),
+                "key": table.get("key"),
+                "rows_examined": flt(table.get("r_rows")) * (cint(table.get("r_loops")) or 1),
+            })
+
+    for value in node.values():
+        if isinstance(value, (dict, list)):
+            yield from get_table_accesses(value)
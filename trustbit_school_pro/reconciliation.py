@@ -0,0 +1,216 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import frappe
+from frappe.utils import flt
+
+from trustbit_school_pro.trustbit_school_pro.doctype.book_sample_distribution.book_sample_distribution import (
+    get_collected_qty,
+    get_collection_status,
+    get_expected_collected_qty,
+)
+
+FIX_BATCH_SIZE = 500
+
+
+def reconcile_collected_qty(site, processes=4, fix=False):
+    """Check qty_collected of all distribution items against submitted collections.
+
+    Distributions are split into shards of consecutive names that run in a
+    process pool, each worker with its own database connection. Returns the
+    mismatched rows and the submitted collections that have no distribution
+    reference to reconcile against.
+    """
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        shards = get_distribution_shards(processes * 4)
+        unlinked = frappe.db.sql_list("""
+            SELECT name
+            FROM `tabBook Sample Collection`
+            WHERE docstatus = 1
+            AND IFNULL(distribution_reference, '') = ''
+        """)
+    finally:
+        frappe.destroy()
+
+    if not shards:
+        return [], unlinked
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=context,
+        initializer=init_worker,
+        initargs=(site,),
+    ) as pool:
+        results = list(pool.map(reconcile_shard, [(from_name, to_name, fix) for from_name, to_name in shards]))
+
+    mismatches = [row for result in results for row in result]
+    return mismatches, unlinked
+
+
+def get_distribution_shards(count):
+    """Split submitted distributions into up to count ranges of consecutive names.
+
+    Each range runs from its first name up to the first name of the next one,
+    the last range is open ended. Ranges on name and distribution_reference
+    can use their indexes, and every distribution falls in exactly one.
+    """
+    names = frappe.db.sql_list("""
+        SELECT name
+        FROM `tabBook Sample Distribution`
+        WHERE docstatus = 1
+        ORDER BY name
+    """)
+    if not names:
+        return []
+
+    starts = names[::math.ceil(len(names) / count)]
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def init_worker(site):
+    frappe.init(site=site)
+    frappe.connect()
+
+
+def reconcile_shard(args):
+    """Reconcile the distributions of one name range, fixing them if asked"""
+    from_name, to_name, fix = args
+    mismatches = get_collected_qty_mismatches(from_name, to_name)
+
+    if fix and mismatches:
+        fix_collected_qty(mismatches)
+        frappe.db.commit()
+
+    return [dict(row) for row in mismatches]
+
+
+def get_collected_qty_mismatches(from_name=None, to_name=None):
+    """Get distribution item rows whose qty_collected disagrees with submitted collections.
+
+    from_name and to_name limit the check to distributions named from_name up
+    to, not including, to_name.
+    """
+    values = {"from_name": from_name, "to_name": to_name}
+
+    # Compare per (distribution, item) first so only disagreeing groups are fetched row-wise
+    groups = frappe.db.sql("""
+        SELECT
+            d.parent,
+            d.item_code,
+            COALESCE(c.qty, 0) as expected_qty
+        FROM (
+            SELECT bsdi.parent, bsdi.item_code, SUM(COALESCE(bsdi.qty_collected, 0)) as qty_collected
+            FROM `tabBook Sample Distribution` bsd
+            INNER JOIN `tabBook Sample Distribution Item` bsdi ON bsdi.parent = bsd.name
+            WHERE bsd.docstatus = 1
+            {distribution_conditions}
+            GROUP BY bsdi.parent, bsdi.item_code
+        ) d
+        LEFT JOIN (
+            SELECT
+                bsc.distribution_reference,
+                bsci.item_code,
+                SUM(COALESCE(bsci.qty_collected, 0) + COALESCE(bsci.qty_damaged, 0) + COALESCE(bsci.qty_lost, 0)) as qty
+            FROM `tabBook Sample Collection` bsc
+            INNER JOIN `tabBook Sample Collection Item` bsci ON bsci.parent = bsc.name
+            WHERE bsc.docstatus = 1
+            {collection_conditions}
+            GROUP BY bsc.distribution_reference, bsci.item_code
+        ) c ON c.distribution_reference = d.parent AND c.item_code = d.item_code
+        WHERE ABS(d.qty_collected - COALESCE(c.qty, 0)) > 0.001
+    """.format(
+        distribution_conditions=get_range_conditions("bsd.name", from_name, to_name),
+        collection_conditions=get_range_conditions("bsc.distribution_reference", from_name, to_name),
+    ), values, as_dict=True)
+
+    if not groups:
+        return []
+
+    parents = tuple({row.parent for row in groups})
+    keys = {(row.parent, row.item_code) for row in groups}
+
+    rows = frappe.db.sql("""
+        SELECT
+            name,
+            parent,
+            item_code,
+            qty,
+            COALESCE(qty_collected, 0) as qty_collected
+        FROM `tabBook Sample Distribution Item`
+        WHERE parenttype = 'Book Sample Distribution'
+        AND parent IN %(parents)s
+        ORDER BY parent, idx
+    """, {"parents": parents}, as_dict=True)
+    expected_qty = get_expected_collected_qty(rows, get_collected_qty(parents))
+
+    mismatches = []
+    for row in rows:
+        if (row.parent, row.item_code) not in keys:
+            continue
+
+        row.expected_qty = expected_qty[row.name]
+        if abs(flt(row.qty_collected) - row.expected_qty) > 0.001:
+            mismatches.append(row)
+
+    return mismatches
+
+
+def get_range_conditions(field, from_name=None, to_name=None):
+    conditions = []
+    if from_name:
+        conditions.append(f"AND {field} >= %(from_name)s")
+    if to_name:
+        conditions.append(f"AND {field} < %(to_name)s")
+
+    return " ".join(conditions)
+
+
+def fix_collected_qty(mismatches):
+    """Write the expected collected quantities and recompute the distribution totals"""
+    for start in range(0, len(mismatches), FIX_BATCH_SIZE):
+        batch = mismatches[start:start + FIX_BATCH_SIZE]
+        frappe.db.bulk_update("Book Sample Distribution Item", {
+            row.name: {
+                "qty_collected": row.expected_qty,
+                "qty_pending": flt(row.qty) - row.expected_qty,
+                "collection_status": get_collection_status(row.qty, row.expected_qty),
+            }
+            for row in batch
+        }, update_modified=False)
+
+        update_distribution_totals({row.parent for row in batch})
+
+
+def update_distribution_totals(distributions):
+    """Recompute totals and status of submitted distributions from their item rows"""
+    frappe.db.sql("""
+        UPDATE `tabBook Sample Distribution` bsd
+        INNER JOIN (
+            SELECT
+                parent,
+                SUM(qty) as qty,
+                SUM(COALESCE(qty_collected, 0)) as qty_collected
+            FROM `tabBook Sample Distribution Item`
+            WHERE parenttype = 'Book Sample Distribution'
+            AND parent IN %(distributions)s
+            GROUP BY parent
+        ) t ON t.parent = bsd.name
+        SET
+            bsd.total_qty_distributed = t.qty,
+            bsd.total_qty_collected = t.qty_collected,
+            bsd.total_qty_pending = t.qty - t.qty_collected,
+            bsd.status = CASE
+                WHEN t.qty - t.qty_collected <= 0 THEN 'Fully Collected'
+                WHEN t.qty_collected > 0 THEN 'Partially Collected'
+                ELSE 'Distributed'
+            END
+        WHERE bsd.docstatus = 1
+    """, {"distributions": tuple(distributions)})
+
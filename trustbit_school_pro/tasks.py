@@ -0,0 +1,117 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import cint, getdate
+
+# Schools reminded per day unless sample_reminder_daily_limit is set in site config
+OVERDUE_REMINDER_LIMIT = 500
+
+
+def send_overdue_reminders():
+    """Queue one digest of overdue samples per school, at most once a day.
+
+    Digests go to School.email through the email queue and, when an SMS
+    gateway is configured, to School.mobile. The most overdue schools go
+    first; schools over the daily limit are picked up on the next run.
+    """
+    today = getdate()
+    limit = cint(frappe.conf.get("sample_reminder_daily_limit")) or OVERDUE_REMINDER_LIMIT
+    sms_enabled = bool(frappe.db.get_single_value("SMS Settings", "sms_gateway_url"))
+
+    schools = {}
+    for row in get_overdue_items(today, sms_enabled):
+        if row.school not in schools:
+            if len(schools) >= limit:
+                continue
+            schools[row.school] = frappe._dict({
+                "school": row.school,
+                "school_name": row.school_name,
+                "contact_person": row.contact_person,
+                "email": row.email,
+                "mobile": row.mobile,
+                "items": [],
+            })
+        schools[row.school]["items"].append(row)
+
+    if not schools:
+        return
+
+    reminded = []
+    for school in schools.values():
+        sent = False
+        if school.email:
+            frappe.sendmail(
+                recipients=[school.email],
+                subject=_("Overdue book samples from {0}").format(school.school_name),
+                template="overdue_sample_reminder",
+                args={"school": school, "items": school["items"], "today": today},
+                reference_doctype="School",
+                reference_name=school.school,
+            )
+            sent = True
+
+        if school.mobile and sms_enabled:
+            sent = send_overdue_sms(school) or sent
+
+        if sent:
+            reminded.append(school.school)
+
+    if reminded:
+        frappe.db.set_value(
+            "School", {"name": ("in", reminded)}, "last_overdue_reminder", today, update_modified=False
+        )
+
+
+def get_overdue_items(today, sms_enabled=False):
+    """Overdue pending rows of reachable schools not yet reminded today, most overdue first.
+
+    Schools with only a mobile are left out when no SMS gateway is set up, so
+    they do not take daily slots from schools that can be reached.
+    """
+    return frappe.db.sql("""
+        SELECT
+            s.name as school,
+            s.school_name,
+            s.contact_person,
+            s.email,
+            s.mobile,
+            bsd.name as distribution,
+            bsd.distribution_date,
+            bsdi.item_code,
+            bsdi.item_name,
+            bsdi.qty - COALESCE(bsdi.qty_collected, 0) as qty_pending,
+            bsdi.expected_return_date,
+            DATEDIFF(%(today)s, bsdi.expected_return_date) as days_overdue
+        FROM `tabBook Sample Distribution Item` bsdi
+        INNER JOIN `tabBook Sample Distribution` bsd ON bsd.name = bsdi.parent
+        INNER JOIN `tabSchool` s ON s.name = bsd.school
+        WHERE bsdi.expected_return_date < %(today)s
+        AND bsdi.parenttype = 'Book Sample Distribution'
+        AND bsdi.qty > COALESCE(bsdi.qty_collected, 0)
+        AND bsd.docstatus = 1
+        AND bsd.status IN ('Distributed', 'Partially Collected')
+        AND s.is_active = 1
+        AND (IFNULL(s.email, '') != '' OR (%(sms_enabled)s AND IFNULL(s.mobile, '') != ''))
+        AND IFNULL(s.last_overdue_reminder, '1900-01-01') < %(today)s
+        ORDER BY bsdi.expected_return_date, s.name, bsd.name
+    """, {"today": today, "sms_enabled": cint(sms_enabled)}, as_dict=True)
+
+
+def send_overdue_sms(school):
+    """Send a short overdue summary to the school's mobile, returning whether it went out"""
+    from frappe.core.doctype.sms_settings.sms_settings import send_sms
+
+    message = _("{0}: {1} sample book(s) from {2} distribution(s) are overdue for return. Please keep them ready for collection.").format(
+        school.school_name,
+        sum(row.qty_pending for row in school["items"]),
+        len({row.distribution for row in school["items"]}),
+    )
+    try:
+        send_sms([school.mobile], message, success_msg=False)
+    except Exception:
+        frappe.log_error(title=_("Overdue reminder SMS to {0} failed").format(school.school))
+        return False
+
+    return True
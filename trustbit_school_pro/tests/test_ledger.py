@@ -0,0 +1,71 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from trustbit_school_pro.ledger import get_archived_entries, get_ledger_entries, get_sort_key
+from trustbit_school_pro.trustbit_school_pro.report.school_sample_ledger.school_sample_ledger import LEDGER
+
+# Sort differently by code point and by a case-insensitive collation
+SCHOOLS = ("_Test abc Public School", "_Test Bright Academy")
+
+
+class TestLedger(FrappeTestCase):
+    def setUp(self):
+        for school in SCHOOLS:
+            if not frappe.db.exists("School", school):
+                frappe.get_doc({"doctype": "School", "school_name": school}).insert()
+
+        for school, posting_date, voucher_no in (
+            (SCHOOLS[0], "2023-06-01", "_T-ARC-1"),
+            (SCHOOLS[1], "2023-06-01", "_T-ARC-2"),
+            (SCHOOLS[0], "2023-07-01", "_T-ARC-3"),
+            (SCHOOLS[1], "2023-07-01", "_T-ARC-4"),
+        ):
+            frappe.get_doc({
+                "doctype": "Book Sample Archive Entry",
+                "is_balance": 1,
+                "voucher_no": voucher_no,
+                "posting_date": posting_date,
+                "school": school,
+                "qty_distributed": 10,
+                "qty_collected": 4,
+            }).insert()
+
+    def tearDown(self):
+        frappe.db.rollback()
+
+    def test_archived_entries_sorted_like_the_merge(self):
+        rows = list(get_archived_entries(LEDGER, frappe._dict()))
+        rows = [row for row in rows if row.school in SCHOOLS]
+
+        self.assertEqual([row.voucher_no for row in rows], ["_T-ARC-2", "_T-ARC-4", "_T-ARC-1", "_T-ARC-3"])
+        self.assertEqual(rows, sorted(rows, key=get_sort_key(LEDGER["order_by"])))
+
+    def test_mixed_case_schools_stay_in_one_block(self):
+        # A live distribution per school, as its source query would return them
+        source_rows = [
+            frappe._dict({
+                "date": frappe.utils.getdate("2024-06-01"),
+                "voucher_type": "Book Sample Distribution",
+                "voucher_no": f"_T-BSD-{i}",
+                "school": school,
+                "item_code": None,
+                "party_name": None,
+                "qty_given": 5,
+                "qty_returned": 0,
+            })
+            for i, school in enumerate(sorted(SCHOOLS))
+        ]
+
+        with patch("trustbit_school_pro.ledger.get_source_entries", side_effect=[iter(source_rows), iter([])]):
+            rows = get_ledger_entries(LEDGER, {})
+
+        schools = [row.school for row in rows if row.school in SCHOOLS]
+        self.assertEqual(schools, [SCHOOLS[1]] * 3 + [SCHOOLS[0]] * 3)
+
+        balances = {row.school: row.balance for row in rows if row.school in SCHOOLS}
+        self.assertEqual(balances, {SCHOOLS[0]: 17, SCHOOLS[1]: 17})
@@ -0,0 +1,76 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from trustbit_school_pro.metrics import observe, render_metrics, timed_doc_method
+
+TEST_CACHE_KEY = "trustbit_metrics_test"
+METRIC = "trustbit_sample_submit_duration_seconds"
+
+
+class TestMetrics(FrappeTestCase):
+    def setUp(self):
+        frappe.cache().delete_value(TEST_CACHE_KEY)
+        patcher = patch("trustbit_school_pro.metrics.METRICS_CACHE_KEY", TEST_CACHE_KEY)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(frappe.cache().delete_value, TEST_CACHE_KEY)
+
+    def test_render_histogram(self):
+        observe(METRIC, 0.25, doctype="Book Sample Loading", status="ok")
+        observe(METRIC, 2, doctype="Book Sample Loading", status="ok")
+
+        lines = render_metrics().splitlines()
+        labels = 'doctype="Book Sample Loading",status="ok"'
+        buckets = [line for line in lines if line.startswith(f"{METRIC}_bucket{{{labels}")]
+
+        self.assertIn(f"# TYPE {METRIC} histogram", lines)
+        self.assertEqual(buckets, [
+            f'{METRIC}_bucket{{{labels},le="0.05"}} 0',
+            f'{METRIC}_bucket{{{labels},le="0.1"}} 0',
+            f'{METRIC}_bucket{{{labels},le="0.25"}} 1',
+            f'{METRIC}_bucket{{{labels},le="0.5"}} 1',
+            f'{METRIC}_bucket{{{labels},le="1"}} 1',
+            f'{METRIC}_bucket{{{labels},le="2.5"}} 2',
+            f'{METRIC}_bucket{{{labels},le="5"}} 2',
+            f'{METRIC}_bucket{{{labels},le="10"}} 2',
+            f'{METRIC}_bucket{{{labels},le="30"}} 2',
+            f'{METRIC}_bucket{{{labels},le="60"}} 2',
+            f'{METRIC}_bucket{{{labels},le="+Inf"}} 2',
+        ])
+        self.assertIn(f"{METRIC}_count{{{labels}}} 2", lines)
+        self.assertIn(f"{METRIC}_sum{{{labels}}} 2.25", lines)
+
+    def test_failed_calls_are_labelled_error(self):
+        @timed_doc_method(METRIC)
+        def on_submit(doc):
+            raise frappe.ValidationError
+
+        @timed_doc_method(METRIC)
+        def on_cancel(doc):
+            pass
+
+        doc = frappe._dict({"doctype": "Book Sample Distribution"})
+        self.assertRaises(frappe.ValidationError, on_submit, doc)
+        on_cancel(doc)
+
+        output = render_metrics()
+        self.assertIn(f'{METRIC}_count{{doctype="Book Sample Distribution",status="error"}} 1', output)
+        self.assertIn(f'{METRIC}_count{{doctype="Book Sample Distribution",status="ok"}} 1', output)
+
+    def test_profiled_calls_are_not_observed(self):
+        @timed_doc_method(METRIC)
+        def on_submit(doc):
+            pass
+
+        frappe.flags.in_sample_profile = True
+        try:
+            on_submit(frappe._dict({"doctype": "Book Sample Collection"}))
+        finally:
+            frappe.flags.in_sample_profile = False
+
+        self.assertNotIn('doctype="Book Sample Collection"', render_metrics())
@@ -0,0 +1,57 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import json
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from trustbit_school_pro.query_plans import MIN_ROWS_EXAMINED, analyze_query, check_query_plans
+
+
+def get_plan(*tables):
+    return json.dumps({"query_block": {"select_id": 1, "nested_loop": [{"table": table} for table in tables]}})
+
+
+def get_query(rows):
+    return frappe._dict({"caller": "trustbit_school_pro.test", "query": "SELECT 1", "values": {}, "rows": rows})
+
+
+class TestQueryPlans(FrappeTestCase):
+    def test_app_queries_use_their_indexes(self):
+        """Fails when a hand-written query loses its index, scans a large table or reads too many rows"""
+        if not frappe.db.exists("Book Sample Distribution", {"docstatus": 1}):
+            self.skipTest("Query plans need a site with submitted Book Sample Distributions")
+
+        failures = [
+            f"{result.get('caller') or result.method}: {'; '.join(result.problems)}"
+            for result in check_query_plans()
+            if result.problems
+        ]
+        self.assertEqual(failures, [])
+
+    def test_full_scan_fails(self):
+        plan = get_plan({"table_name": "bsd", "access_type": "ALL", "r_rows": MIN_ROWS_EXAMINED + 1, "r_loops": 1})
+        with patch.object(frappe.db, "sql", return_value=[[plan]]):
+            result = analyze_query(get_query(rows=MIN_ROWS_EXAMINED + 1), {})
+
+        self.assertEqual(result.problems, [f"bsd full scan reads {MIN_ROWS_EXAMINED + 1} rows"])
+
+    def test_unexpected_index_fails(self):
+        plan = get_plan({"table_name": "bsd", "access_type": "ref", "key": "modified", "r_rows": 5, "r_loops": 1})
+        with patch.object(frappe.db, "sql", return_value=[[plan]]):
+            result = analyze_query(get_query(rows=5), {"bsd": ("school",)})
+
+        self.assertEqual(result.problems, ["bsd uses modified (ref), expected school"])
+
+    def test_rows_examined_ratio_fails(self):
+        plan = get_plan(
+            {"table_name": "bsd", "access_type": "ref", "key": "school", "r_rows": 20, "r_loops": 1},
+            {"table_name": "bsdi", "access_type": "ref", "key": "parent", "r_rows": 100, "r_loops": 20},
+        )
+        with patch.object(frappe.db, "sql", return_value=[[plan]]):
+            self.assertEqual(analyze_query(get_query(rows=1), {}, max_ratio=10).problems, [
+                "examines 2020 rows for 1 returned"
+            ])
+            self.assertEqual(analyze_query(get_query(rows=1), {}, max_ratio=None).problems, [])
@@ -0,0 +1,35 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from trustbit_school_pro.trustbit_school_pro.report.sample_collection_plan.sample_collection_plan import (
+    assign_vehicles,
+)
+
+
+def get_vans(**capacities):
+    return {name: frappe._dict({"name": name, "free_capacity": qty}) for name, qty in capacities.items()}
+
+
+def get_schools(*quantities):
+    return [frappe._dict({"school": f"S{i}", "qty_pending": qty}) for i, qty in enumerate(quantities, 1)]
+
+
+def get_assignment(plan):
+    return {vehicle: [school.school for school in stops] for vehicle, stops in plan.items()}
+
+
+class TestSampleCollectionPlan(FrappeTestCase):
+    def test_vans_filled_in_turn(self):
+        plan = assign_vehicles(get_schools(60, 30, 20, 10), get_vans(A=100, B=50))
+        self.assertEqual(get_assignment(plan), {"A": ["S1", "S2"], "B": ["S3", "S4"]})
+
+    def test_oversized_school_does_not_end_planning(self):
+        plan = assign_vehicles(get_schools(60, 30, 20, 45, 10), get_vans(A=100, B=50))
+        self.assertEqual(get_assignment(plan), {"A": ["S1", "S2"], "B": ["S3", "S5"], None: ["S4"]})
+
+    def test_school_too_large_for_current_van_goes_to_a_later_one(self):
+        plan = assign_vehicles(get_schools(120, 40), get_vans(A=50, B=150))
+        self.assertEqual(get_assignment(plan), {"A": ["S2"], "B": ["S1"]})
@@ -0,0 +1 @@
+# Book Sample Archive Doctype
@@ -0,0 +1,350 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import flt, now_datetime
+
+ARCHIVE_BATCH_SIZE = 200
+
+# Posting date field and ledger line builder of each archived doctype
+ARCHIVE_DATE_FIELDS = {
+    "Book Sample Loading": "loading_date",
+    "Book Sample Distribution": "distribution_date",
+    "Book Sample Collection": "collection_date",
+}
+
+# Stock Entry field linking back to each archived doctype
+STOCK_ENTRY_LINK_FIELDS = {
+    "Book Sample Loading": "custom_book_sample_loading",
+    "Book Sample Distribution": "custom_book_sample_distribution",
+    "Book Sample Collection": "custom_book_sample_collection",
+}
+
+# Doctypes attached to a document, with their reference doctype and name columns
+ATTACHED_DOCTYPES = (
+    ("File", "attached_to_doctype", "attached_to_name"),
+    ("Comment", "reference_doctype", "reference_name"),
+    ("Version", "ref_doctype", "docname"),
+)
+
+ENTRY_FIELDS = [
+    "name", "creation", "modified", "owner", "modified_by",
+    "season", "is_balance", "voucher_type", "voucher_no", "posting_date", "party_name",
+    "item_code", "item_name", "class_grade", "school", "vehicle", "warehouse",
+    "qty_loaded", "qty_distributed", "qty_collected", "qty_damaged", "qty_lost",
+    "source_warehouse", "target_warehouse",
+]
+
+
+class BookSampleArchive(Document):
+    pass
+
+
+@frappe.whitelist()
+def archive_season(season):
+    """Queue archival of the closed sample documents of a season (Fiscal Year)"""
+    frappe.only_for("System Manager")
+
+    frappe.enqueue(
+        "trustbit_school_pro.trustbit_school_pro.doctype.book_sample_archive.book_sample_archive.archive_closed_season",
+        queue="long",
+        timeout=7200,
+        job_id=f"archive_sample_season::{season}",
+        deduplicate=True,
+        season=season,
+    )
+    frappe.msgprint(_("Archival of season {0} has been queued").format(season))
+
+
+def archive_closed_season(season):
+    """Move closed documents of a season out of the active sample tables.
+
+    Fully Collected and Cancelled distributions go with their collections, and
+    loadings go once no open distribution refers to them. Each archived document
+    is kept as JSON, its ledger lines as Book Sample Archive Entry rows, and one
+    balance row per (item, school, vehicle) is left for the ledger reports.
+    """
+    year_start, year_end = frappe.db.get_value(
+        "Fiscal Year", season, ["year_start_date", "year_end_date"]
+    )
+    vouchers = get_closed_vouchers(year_start, year_end)
+
+    total = sum(len(names) for names in vouchers.values()) or 1
+    done = 0
+    for doctype, names in vouchers.items():
+        for start in range(0, len(names), ARCHIVE_BATCH_SIZE):
+            batch = names[start:start + ARCHIVE_BATCH_SIZE]
+            move_to_archive(doctype, batch, season)
+            frappe.db.commit()
+
+            done += len(batch)
+            frappe.publish_progress(
+                done * 100 / total,
+                title=_("Archiving Season {0}").format(season),
+                description=_("{0} documents archived").format(done),
+            )
+
+    update_season_balances(season, year_end)
+    frappe.db.commit()
+
+    return {doctype: len(names) for doctype, names in vouchers.items()}
+
+
+def get_closed_vouchers(from_date, to_date):
+    """Get names of the documents that can be archived for a season, by doctype"""
+    values = {"from_date": from_date, "to_date": to_date}
+
+    # A distribution is closed when nothing is pending and all its collections fall in the season
+    distributions = frappe.db.sql_list("""
+        SELECT bsd.name
+        FROM `tabBook Sample Distribution` bsd
+        WHERE bsd.distribution_date BETWEEN %(from_date)s AND %(to_date)s
+        AND (bsd.docstatus = 2 OR (bsd.docstatus = 1 AND bsd.status = 'Fully Collected'))
+        AND NOT EXISTS (
+            SELECT 1 FROM `tabBook Sample Collection` bsc
+            WHERE bsc.distribution_reference = bsd.name
+            AND bsc.docstatus = 1
+            AND bsc.collection_date > %(to_date)s
+        )
+    """, values)
+    values["distributions"] = tuple(distributions) or ("",)
+
+    collections = frappe.db.sql_list("""
+        SELECT bsc.name
+        FROM `tabBook Sample Collection` bsc
+        LEFT JOIN `tabBook Sample Distribution` bsd ON bsd.name = bsc.distribution_reference
+        WHERE bsc.docstatus > 0
+        AND (
+            bsc.distribution_reference IN %(distributions)s
+            OR (
+                bsc.collection_date BETWEEN %(from_date)s AND %(to_date)s
+                AND (bsd.name IS NULL OR bsc.docstatus = 2)
+            )
+        )
+    """, values)
+
+    loadings = frappe.db.sql_list("""
+        SELECT bsl.name
+        FROM `tabBook Sample Loading` bsl
+        WHERE bsl.loading_date BETWEEN %(from_date)s AND %(to_date)s
+        AND (bsl.docstatus = 2 OR (bsl.docstatus = 1 AND bsl.status = 'Returned'))
+        AND NOT EXISTS (
+            SELECT 1 FROM `tabBook Sample Distribution` bsd
+            WHERE bsd.loading_reference = bsl.name
+            AND bsd.docstatus < 2
+            AND bsd.name NOT IN %(distributions)s
+        )
+    """, values)
+
+    return {
+        "Book Sample Collection": collections,
+        "Book Sample Distribution": distributions,
+        "Book Sample Loading": loadings,
+    }
+
+
+def move_to_archive(doctype, names, season):
+    """Copy documents into the archive tables and delete them from the active ones"""
+    if not names:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    archives, entries = [], []
+
+    for name in names:
+        doc = frappe.get_doc(doctype, name)
+        posting_date = doc.get(ARCHIVE_DATE_FIELDS[doctype])
+        archives.append((
+            doc.name, now, now, user, user,
+            doctype, doc.name, posting_date, season, doc.docstatus,
+            doc.get("school"), doc.get("vehicle"), frappe.as_json(doc.as_dict()),
+        ))
+
+        # Cancelled documents never reach the ledgers
+        if doc.docstatus == 1:
+            for line in get_ledger_lines(doc):
+                entries.append([
+                    frappe.generate_hash(length=10), now, now, user, user,
+                    season, 0, doctype, doc.name, posting_date,
+                ] + [line.get(field) for field in ENTRY_FIELDS[10:]])
+
+    frappe.db.bulk_insert(
+        "Book Sample Archive",
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by",
+            "voucher_type", "voucher_no", "posting_date", "season", "archived_docstatus",
+            "school", "vehicle", "document",
+        ],
+        values=archives,
+        ignore_duplicates=True,
+    )
+    frappe.db.bulk_insert("Book Sample Archive Entry", fields=ENTRY_FIELDS, values=entries)
+
+    unlink_archived(doctype, names)
+
+    child_doctype = frappe.get_meta(doctype).get_field("items").options
+    frappe.db.delete(child_doctype, {"parenttype": doctype, "parent": ("in", names)})
+    frappe.db.delete(doctype, {"name": ("in", names)})
+
+
+def unlink_archived(doctype, names):
+    """Clear or repoint references to documents that are about to be deleted.
+
+    Stock Entry links and amended_from of later amendments are cleared; the
+    archived JSON still holds the Stock Entry and amended_from names. Files,
+    comments and versions move to the Book Sample Archive record, which has
+    the same name as the document.
+    """
+    values = {"doctype": doctype, "names": tuple(names)}
+    link_field = STOCK_ENTRY_LINK_FIELDS[doctype]
+
+    frappe.db.sql(f"""
+        UPDATE `tabStock Entry`
+        SET `{link_field}` = NULL
+        WHERE `{link_field}` IN %(names)s
+    """, values)
+
+    frappe.db.sql(f"""
+        UPDATE `tab{doctype}`
+        SET amended_from = NULL
+        WHERE amended_from IN %(names)s
+        AND name NOT IN %(names)s
+    """, values)
+
+    for attached_doctype, doctype_field, name_field in ATTACHED_DOCTYPES:
+        frappe.db.sql(f"""
+            UPDATE `tab{attached_doctype}`
+            SET `{doctype_field}` = 'Book Sample Archive'
+            WHERE `{doctype_field}` = %(doctype)s
+            AND `{name_field}` IN %(names)s
+        """, values)
+
+
+def get_ledger_lines(doc):
+    """Get the ledger quantities of each item row of a sample document"""
+    lines = []
+    for item in doc.items:
+        line = {
+            "item_code": item.item_code,
+            "item_name": item.item_name,
+            "class_grade": item.class_grade,
+            "school": doc.get("school"),
+            "vehicle": doc.get("vehicle"),
+            "source_warehouse": doc.source_warehouse,
+            "target_warehouse": doc.target_warehouse,
+        }
+
+        if doc.doctype == "Book Sample Loading":
+            line.update({
+                "party_name": doc.loader_name,
+                "warehouse": doc.source_warehouse,
+                "qty_loaded": flt(item.qty),
+            })
+        elif doc.doctype == "Book Sample Distribution":
+            line.update({
+                "party_name": doc.distributor_name,
+                "warehouse": doc.source_warehouse,
+                "qty_distributed": flt(item.qty),
+            })
+        else:
+            line.update({
+                "party_name": doc.collector_name,
+                "warehouse": doc.target_warehouse,
+                "qty_collected": flt(item.qty_collected),
+                "qty_damaged": flt(item.qty_damaged),
+                "qty_lost": flt(item.qty_lost),
+            })
+
+        lines.append(line)
+
+    return lines
+
+
+def update_season_balances(season, posting_date):
+    """Rebuild the summarized balance rows of a season from its archived lines"""
+    frappe.db.delete("Book Sample Archive Entry", {"season": season, "is_balance": 1})
+
+    balances = frappe.db.sql("""
+        SELECT
+            item_code,
+            MAX(item_name) as item_name,
+            school,
+            vehicle,
+            SUM(qty_loaded) as qty_loaded,
+            SUM(qty_distributed) as qty_distributed,
+            SUM(qty_collected) as qty_collected,
+            SUM(qty_damaged) as qty_damaged,
+            SUM(qty_lost) as qty_lost
+        FROM `tabBook Sample Archive Entry`
+        WHERE season = %s
+        AND is_balance = 0
+        GROUP BY item_code, school, vehicle
+    """, season, as_dict=True)
+
+    now = now_datetime()
+    user = frappe.session.user
+    frappe.db.bulk_insert("Book Sample Archive Entry", fields=ENTRY_FIELDS, values=[
+        (
+            frappe.generate_hash(length=10), now, now, user, user,
+            season, 1, "Fiscal Year", season, posting_date, None,
+            row.item_code, row.item_name, None, row.school, row.vehicle, None,
+            row.qty_loaded, row.qty_distributed, row.qty_collected, row.qty_damaged, row.qty_lost,
+            None, None,
+        )
+        for row in balances
+    ])
+
+
+def get_archived_ledger_entries(filters, order_by="ae.posting_date, ae.voucher_no"):
+    """Get archived rows for the ledger reports.
+
+    Returns the season balance rows, or the archived document lines when the
+    include_archived filter is set. order_by may use the selected aliases.
+    """
+    conditions = []
+    values = dict(filters, is_balance=0 if filters.get("include_archived") else 1)
+
+    if filters.get("from_date"):
+        conditions.append("AND ae.posting_date >= %(from_date)s")
+
+    if filters.get("to_date"):
+        conditions.append("AND ae.posting_date <= %(to_date)s")
+
+    if filters.get("item_code"):
+        conditions.append("AND ae.item_code = %(item_code)s")
+
+    if filters.get("school"):
+        conditions.append("AND ae.school = %(school)s")
+
+    if filters.get("vehicle"):
+        conditions.append("AND ae.vehicle = %(vehicle)s")
+
+    if filters.get("area_zone"):
+        conditions.append("AND s.area_zone = %(area_zone)s")
+
+    return frappe.db.sql("""
+        SELECT
+            ae.posting_date as date,
+            IF(ae.is_balance, 'Fiscal Year', 'Book Sample Archive') as voucher_type,
+            ae.voucher_no,
+            ae.voucher_type as archived_voucher_type,
+            ae.item_code,
+            ae.item_name,
+            ae.class_grade,
+            ae.school,
+            ae.vehicle,
+            ae.warehouse,
+            ae.party_name,
+            ae.qty_loaded,
+            ae.qty_distributed,
+            ae.qty_collected,
+            s.area_zone
+        FROM `tabBook Sample Archive Entry` ae
+        LEFT JOIN `tabSchool` s ON s.name = ae.school
+        WHERE ae.is_balance = %(is_balance)s
+        {conditions}
+        ORDER BY {order_by}
+    """.format(conditions=" ".join(conditions), order_by=order_by), values, as_dict=True)
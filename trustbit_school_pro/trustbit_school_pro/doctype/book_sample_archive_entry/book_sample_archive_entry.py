@@ -0,0 +1,13 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class BookSampleArchiveEntry(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("Book Sample Archive Entry", ["season", "is_balance"])
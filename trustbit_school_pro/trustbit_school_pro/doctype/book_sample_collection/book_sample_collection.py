@@ -6,21 +6,39 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt
 
+from trustbit_school_pro.metrics import timed_doc_method
+from trustbit_school_pro.profiling import profile_lifecycle
+from trustbit_school_pro.trustbit_school_pro.doctype.book_sample_loading.book_sample_loading import (
+    set_item_details,
+)
+from trustbit_school_pro.trustbit_school_pro.doctype.school_pro_settings.school_pro_settings import (
+    get_field_warehouse,
+)
+from trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle import update_books_on_board
+
 
 class BookSampleCollection(Document):
+    @profile_lifecycle
     def validate(self):
         self.validate_items()
+        if self.docstatus == 0:
+            set_item_details(self, missing_only=True)
         self.validate_distribution_reference()
         self.validate_quantities()
         self.calculate_totals()
 
+    @frappe.whitelist()
+    def enrich_items(self):
+        """Fill item details of all rows, for pasted or uploaded rows"""
+        set_item_details(self)
+
     def validate_items(self):
         """Validate that items are provided"""
         if not self.items:
             frappe.throw(_("Please add at least one book to collect"))
 
     def validate_distribution_reference(self):
-        """Validate distribution reference and fetch school"""
+        """Validate distribution reference and fetch school, vehicle and field warehouse"""
         if self.distribution_reference:
             dist = frappe.get_doc("Book Sample Distribution", self.distribution_reference)
             if dist.docstatus != 1:
@@ -32,6 +50,18 @@ class BookSampleCollection(Document):
             if self.school != dist.school:
                 frappe.throw(_("School does not match with distribution reference"))
 
+            self.vehicle = get_distribution_vehicle(dist)
+
+            # Books come back out of the field warehouse they were distributed into
+            if not self.source_warehouse:
+                self.source_warehouse = dist.target_warehouse
+
+        if not self.source_warehouse:
+            self.source_warehouse = get_field_warehouse(self.school, self.vehicle)
+
+        if not self.source_warehouse:
+            frappe.throw(_("Please set a Source Warehouse or a Default Field Warehouse in School Pro Settings"))
+
     def validate_quantities(self):
         """Validate collection quantities don't exceed pending"""
         for item in self.items:
@@ -55,18 +85,32 @@ class BookSampleCollection(Document):
         self.total_qty_damaged = sum(flt(item.qty_damaged) for item in self.items)
         self.total_qty_lost = sum(flt(item.qty_lost) for item in self.items)
 
+    @profile_lifecycle
+    @timed_doc_method("trustbit_sample_submit_duration_seconds")
     def on_submit(self):
         """Create stock entries and update distribution on submit"""
         self.create_stock_entries()
         self.update_distribution()
+        self.update_vehicle_load()
         self.db_set("status", "Collected")
 
+    @profile_lifecycle
+    @timed_doc_method("trustbit_sample_cancel_duration_seconds")
     def on_cancel(self):
         """Cancel linked stock entries and revert distribution"""
         self.cancel_stock_entries()
         self.revert_distribution()
+        self.update_vehicle_load(cancel=True)
         self.db_set("status", "Cancelled")
 
+    def update_vehicle_load(self, cancel=False):
+        """Add collected books to the van's books on board when collected into a van"""
+        sign = -1 if cancel else 1
+        qty_out = flt(self.total_qty_collected) + flt(self.total_qty_damaged) + flt(self.total_qty_lost)
+        update_books_on_board(self.source_warehouse, -sign * qty_out)
+        update_books_on_board(self.target_warehouse, sign * flt(self.total_qty_collected))
+
+    @timed_doc_method("trustbit_stock_entry_duration_seconds")
     def create_stock_entries(self):
         """Create Stock Entries for collection"""
         # Stock Entry for good collected books (Material Transfer back to main warehouse)
@@ -150,11 +194,12 @@ class BookSampleCollection(Document):
         collection_data = []
         for item in self.items:
             collection_data.append({
+                "distribution_item": item.distribution_item,
                 "item_code": item.item_code,
                 "qty_collected": flt(item.qty_collected) + flt(item.qty_damaged) + flt(item.qty_lost),
             })
 
-        dist.update_collection(collection_data)
+        dist.update_collection(collection_data, collection=self.name)
 
     def revert_distribution(self):
         """Revert collection quantities in distribution on cancel"""
@@ -167,11 +212,21 @@ class BookSampleCollection(Document):
         collection_data = []
         for item in self.items:
             collection_data.append({
+                "distribution_item": item.distribution_item,
                 "item_code": item.item_code,
                 "qty_collected": -(flt(item.qty_collected) + flt(item.qty_damaged) + flt(item.qty_lost)),
             })
 
-        dist.update_collection(collection_data)
+        dist.update_collection(collection_data, collection=self.name)
+
+
+def get_distribution_vehicle(dist):
+    """Get the van a distribution went out on, falling back to its loading reference"""
+    if dist.vehicle:
+        return dist.vehicle
+
+    if dist.loading_reference:
+        return frappe.db.get_value("Book Sample Loading", dist.loading_reference, "vehicle")
 
 
 @frappe.whitelist()
@@ -197,12 +252,14 @@ def make_collection_from_distribution(distribution):
     collection = frappe.new_doc("Book Sample Collection")
     collection.school = dist.school
     collection.distribution_reference = dist.name
-    collection.source_warehouse = dist.target_warehouse  # Samples in Field
+    collection.vehicle = get_distribution_vehicle(dist)
+    collection.source_warehouse = dist.target_warehouse  # Field warehouse of the distribution
 
     # Add pending items
     for item in dist.items:
         if flt(item.qty_pending) > 0:
             collection.append("items", {
+                "distribution_item": item.name,
                 "item_code": item.item_code,
                 "item_name": item.item_name,
                 "class_grade": item.class_grade,
@@ -0,0 +1,10 @@
+// Copyright (c) 2024, Trustbit Software and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings['Book Sample Collection'] = {
+    onload: function(listview) {
+        frappe.require('sample_forms.bundle.js', function() {
+            trustbit_school_pro.bulk_cancel.setup(listview);
+        });
+    }
+};
@@ -2,7 +2,23 @@
 // For license information, please see license.txt
 
 frappe.ui.form.on('Book Sample Distribution', {
+    setup: function(frm) {
+        frappe.require('sample_forms.bundle.js', function() {
+            trustbit_school_pro.sample_forms.set_item_query(frm);
+        });
+    },
+
     refresh: function(frm) {
+        frappe.require('sample_forms.bundle.js', function() {
+            trustbit_school_pro.sample_forms.add_enrich_button(frm);
+        });
+
+        if (frm.doc.docstatus === 0 && frm.doc.loading_reference) {
+            frm.add_custom_button(__('Get Items from Loading'), function() {
+                get_items_from_loading(frm);
+            });
+        }
+
         // Add button to create collection
         if (frm.doc.docstatus === 1 && frm.doc.status !== 'Fully Collected') {
             frm.add_custom_button(__('Create Collection'), function() {
@@ -15,26 +31,26 @@ frappe.ui.form.on('Book Sample Distribution', {
     }
 });
 
+frappe.ui.form.on('Book Sample Distribution', 'loading_reference', function(frm) {
+    // Pre-fill an empty grid with what is still on the van
+    let has_items = (frm.doc.items || []).some(item => item.item_code);
+    if (frm.doc.loading_reference && !has_items) {
+        get_items_from_loading(frm);
+    }
+});
+
 frappe.ui.form.on('Book Sample Distribution Item', {
     item_code: function(frm, cdt, cdn) {
         let row = locals[cdt][cdn];
         if (row.item_code) {
-            // Fetch class grades for the item
-            frappe.call({
-                method: 'trustbit_school_pro.trustbit_school_pro.doctype.book_sample_loading.book_sample_loading.get_item_class_grades',
-                args: { item_code: row.item_code },
-                callback: function(r) {
-                    if (r.message !== undefined) {
-                        frappe.model.set_value(cdt, cdn, 'class_grade', r.message);
-                    }
-                }
-            });
+            // Class grades and available qty are fetched for all changed rows in one request
+            trustbit_school_pro.sample_forms.queue_item_details(frm, cdt, cdn, true);
         }
     },
 
     class_grade: function(frm, cdt, cdn) {
         // Open multiselect dialog when class_grade field is clicked/edited
-        show_class_grade_dialog(frm, cdt, cdn);
+        trustbit_school_pro.sample_forms.show_class_grade_dialog(frm, cdt, cdn);
     },
 
     items_add: function(frm, cdt, cdn) {
@@ -43,56 +59,24 @@ frappe.ui.form.on('Book Sample Distribution Item', {
     }
 });
 
-function show_class_grade_dialog(frm, cdt, cdn) {
-    let row = locals[cdt][cdn];
-    let current_values = row.class_grade ? row.class_grade.split(', ').map(v => v.trim()) : [];
-
-    // Fetch all class grades
+function get_items_from_loading(frm) {
     frappe.call({
-        method: 'frappe.client.get_list',
-        args: {
-            doctype: 'Class Grade',
-            filters: { is_active: 1 },
-            fields: ['name', 'class_order'],
-            limit_page_length: 0
-        },
+        method: 'trustbit_school_pro.trustbit_school_pro.doctype.book_sample_distribution.book_sample_distribution.get_items_from_loading',
+        args: { loading: frm.doc.loading_reference },
+        freeze: true,
         callback: function(r) {
-            if (r.message) {
-                // Sort by class_order
-                let sorted = r.message.sort((a, b) => (a.class_order || 0) - (b.class_order || 0));
-
-                // Build HTML checkboxes
-                let html = '<div class="class-grade-grid" style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 10px;">';
-                sorted.forEach(function(cg) {
-                    let checked = current_values.includes(cg.name) ? 'checked' : '';
-                    html += `<label style="display: flex; align-items: center; cursor: pointer;">
-                        <input type="checkbox" class="class-grade-checkbox" value="${cg.name}" ${checked} style="margin-right: 8px;">
-                        ${cg.name}
-                    </label>`;
-                });
-                html += '</div>';
-
-                let d = new frappe.ui.Dialog({
-                    title: __('Select Class/Grade'),
-                    fields: [
-                        {
-                            fieldname: 'class_grades_html',
-                            fieldtype: 'HTML',
-                            options: html
-                        }
-                    ],
-                    primary_action_label: __('Select'),
-                    primary_action: function() {
-                        let selected = [];
-                        d.$wrapper.find('.class-grade-checkbox:checked').each(function() {
-                            selected.push($(this).val());
-                        });
-                        frappe.model.set_value(cdt, cdn, 'class_grade', selected.join(', '));
-                        d.hide();
-                    }
-                });
-                d.show();
+            let books = r.message || [];
+            if (!books.length) {
+                frappe.msgprint(__('No books from {0} are left on the van', [frm.doc.loading_reference]));
+                return;
             }
+
+            frm.clear_table('items');
+            books.forEach(function(book) {
+                let row = frm.add_child('items');
+                Object.assign(row, book, { expected_return_date: frm.doc.expected_return_date });
+            });
+            frm.refresh_field('items');
         }
     });
 }
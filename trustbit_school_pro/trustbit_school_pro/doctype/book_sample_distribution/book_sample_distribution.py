@@ -1,21 +1,46 @@
 # Copyright (c) 2024, Trustbit Software and contributors
 # For license information, please see license.txt
 
+from collections import defaultdict
+
 import frappe
 from frappe import _
 from frappe.model.document import Document
 from frappe.utils import flt, getdate
 
+from trustbit_school_pro.metrics import timed_doc_method
+from trustbit_school_pro.profiling import profile_lifecycle
+from trustbit_school_pro.trustbit_school_pro.doctype.book_sample_loading.book_sample_loading import (
+    set_item_details,
+)
+from trustbit_school_pro.trustbit_school_pro.doctype.book_sample_stock_reservation.book_sample_stock_reservation import (
+    get_available_qty_map,
+    release_stock,
+    reserve_stock,
+)
+from trustbit_school_pro.trustbit_school_pro.doctype.school_pro_settings.school_pro_settings import (
+    get_field_warehouse,
+)
+from trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle import update_books_on_board
+
 
 class BookSampleDistribution(Document):
+    @profile_lifecycle
     def validate(self):
         self.validate_items()
         self.validate_warehouse()
+        if self.docstatus == 0:
+            set_item_details(self, missing_only=True)
         self.set_expected_return_dates()
         self.calculate_totals()
         self.validate_stock_availability()
         self.update_item_collection_status()
 
+    @frappe.whitelist()
+    def enrich_items(self):
+        """Fill item details and available qty of all rows, for pasted or uploaded rows"""
+        set_item_details(self)
+
     def validate_items(self):
         """Validate that items are provided"""
         if not self.items:
@@ -27,9 +52,6 @@ class BookSampleDistribution(Document):
 
     def validate_warehouse(self):
         """Validate source and target warehouses"""
-        if self.source_warehouse == self.target_warehouse:
-            frappe.throw(_("Source and Target warehouse cannot be the same"))
-
         # If loading reference is provided, use its vehicle's warehouse
         if self.loading_reference and not self.source_warehouse:
             vehicle = frappe.db.get_value("Book Sample Loading", self.loading_reference, "vehicle")
@@ -37,6 +59,15 @@ class BookSampleDistribution(Document):
                 self.source_warehouse = frappe.db.get_value("Vehicle", vehicle, "warehouse")
                 self.vehicle = vehicle
 
+        if not self.target_warehouse:
+            self.target_warehouse = get_field_warehouse(self.school, self.vehicle)
+
+        if not self.target_warehouse:
+            frappe.throw(_("Please set a Target Warehouse or a Default Field Warehouse in School Pro Settings"))
+
+        if self.source_warehouse == self.target_warehouse:
+            frappe.throw(_("Source and Target warehouse cannot be the same"))
+
     def set_expected_return_dates(self):
         """Set expected return date on items if not set"""
         if self.expected_return_date:
@@ -51,31 +82,50 @@ class BookSampleDistribution(Document):
         self.total_qty_pending = self.total_qty_distributed - self.total_qty_collected
 
     def validate_stock_availability(self):
-        """Check if stock is available in source warehouse"""
+        """Check stock in source warehouse, less what other drafts have reserved"""
+        # Stock has already left the van once submitted
+        if self.docstatus == 1 and getattr(self, "_action", None) != "submit":
+            return
+
+        available = get_available_qty_map(
+            self.source_warehouse,
+            {item.item_code for item in self.items if item.item_code},
+            self.doctype,
+            self.name,
+        )
+
+        required = defaultdict(float)
         for item in self.items:
-            available_qty = get_stock_balance(item.item_code, self.source_warehouse)
-            item.available_qty_in_van = available_qty
-
-            if self.docstatus == 0 and flt(available_qty) < flt(item.qty):
-                frappe.msgprint(
-                    _("Insufficient stock for {0}. Available: {1}, Required: {2}").format(
-                        item.item_code, available_qty, item.qty
-                    ),
-                    indicator="orange",
-                    alert=True
-                )
+            item.available_qty_in_van = available.get(item.item_code, 0)
+            required[item.item_code] += flt(item.qty)
+
+        for item_code, qty in required.items():
+            available_qty = available.get(item_code, 0)
+            if available_qty >= qty:
+                continue
+
+            message = _("Insufficient stock for {0}. Available: {1}, Required: {2}").format(
+                item_code, available_qty, qty
+            )
+            # Block the submit here instead of letting the Stock Entry fail
+            if self.docstatus == 1:
+                frappe.throw(message, title=_("Insufficient Stock"))
+
+            frappe.msgprint(message, indicator="orange", alert=True)
+
+    def on_update(self):
+        """Reserve van stock while the distribution is a draft"""
+        if self.docstatus == 0:
+            reserve_stock(self.doctype, self.name, self.source_warehouse, self.items)
+
+    def on_trash(self):
+        release_stock(self.doctype, self.name)
 
     def update_item_collection_status(self):
         """Update collection status for each item"""
         for item in self.items:
             item.qty_pending = flt(item.qty) - flt(item.qty_collected)
-
-            if flt(item.qty_collected) <= 0:
-                item.collection_status = "Pending"
-            elif flt(item.qty_collected) >= flt(item.qty):
-                item.collection_status = "Collected"
-            else:
-                item.collection_status = "Partial"
+            item.collection_status = get_collection_status(item.qty, item.qty_collected)
 
     def update_status(self):
         """Update overall distribution status based on collection"""
@@ -91,21 +141,35 @@ class BookSampleDistribution(Document):
             else:
                 self.status = "Distributed"
 
+    @profile_lifecycle
+    @timed_doc_method("trustbit_sample_submit_duration_seconds")
     def on_submit(self):
         """Create stock entry on submit"""
         self.create_stock_entry()
+        release_stock(self.doctype, self.name)
+        self.update_vehicle_load()
         self.db_set("status", "Distributed")
 
+    @profile_lifecycle
+    @timed_doc_method("trustbit_sample_cancel_duration_seconds")
     def on_cancel(self):
         """Cancel linked stock entry"""
         if self.stock_entry:
             se = frappe.get_doc("Stock Entry", self.stock_entry)
             if se.docstatus == 1:
                 se.cancel()
+        self.update_vehicle_load(cancel=True)
         self.db_set("status", "Cancelled")
 
+    def update_vehicle_load(self, cancel=False):
+        """Take the distributed quantity off the van's books on board"""
+        qty = -flt(self.total_qty_distributed) if cancel else flt(self.total_qty_distributed)
+        update_books_on_board(self.source_warehouse, -qty)
+        update_books_on_board(self.target_warehouse, qty)
+
+    @timed_doc_method("trustbit_stock_entry_duration_seconds")
     def create_stock_entry(self):
-        """Create Material Transfer Stock Entry to 'Samples in Field'"""
+        """Create Material Transfer Stock Entry to the field warehouse"""
         se = frappe.new_doc("Stock Entry")
         se.stock_entry_type = "Material Transfer"
         se.posting_date = self.distribution_date
@@ -134,34 +198,200 @@ class BookSampleDistribution(Document):
         )
 
     @frappe.whitelist()
-    def update_collection(self, items):
-        """Update collection quantities from collection document"""
+    def update_collection(self, items, collection=None):
+        """Update collection quantities from collection document.
+
+        Only the changed item columns and the parent totals are written, without
+        re-running validate or creating a Version; one comment records the change.
+        """
         if self.docstatus != 1:
             frappe.throw(_("Document must be submitted to update collection"))
 
-        for collection_item in items:
-            for item in self.items:
-                if item.item_code == collection_item.get("item_code"):
-                    item.qty_collected = flt(item.qty_collected) + flt(collection_item.get("qty_collected", 0))
-                    item.qty_pending = flt(item.qty) - flt(item.qty_collected)
+        changed_rows = self.apply_collection(items)
+        if not changed_rows:
+            return
 
-                    if flt(item.qty_collected) >= flt(item.qty):
-                        item.collection_status = "Collected"
-                    elif flt(item.qty_collected) > 0:
-                        item.collection_status = "Partial"
+        frappe.db.bulk_update(self.items[0].doctype, {
+            item.name: {
+                "qty_collected": item.qty_collected,
+                "qty_pending": item.qty_pending,
+                "collection_status": item.collection_status,
+            }
+            for item in changed_rows
+        }, update_modified=False)
 
         self.calculate_totals()
         self.update_status()
-        self.save(ignore_permissions=True)
+        self.db_set({
+            "total_qty_collected": self.total_qty_collected,
+            "total_qty_pending": self.total_qty_pending,
+            "status": self.status,
+        }, notify=True)
+
+        qty = sum(flt(collection_item.get("qty_collected")) for collection_item in items)
+        self.add_comment("Info", _("{0} {1} collected qty by {2} on {3} row(s)").format(
+            collection or _("Collection"),
+            _("reverted") if qty < 0 else _("updated"),
+            abs(qty),
+            len(changed_rows),
+        ))
+
+    def apply_collection(self, items):
+        """Apply collected quantities to the item rows and return the rows changed.
+
+        Lines are matched on the distribution item row they reference. Lines
+        without one only know the book; its rows are set from the submitted
+        collections, spread as get_expected_collected_qty does. The collection
+        calls this from on_submit and on_cancel, after its docstatus is saved,
+        so the database already includes or excludes it.
+        """
+        rows_by_name = {item.name: item for item in self.items}
+
+        changed_rows = {}
+        unlinked_books = set()
+        for collection_item in items:
+            if not flt(collection_item.get("qty_collected")):
+                continue
+
+            item = rows_by_name.get(collection_item.get("distribution_item"))
+            if not item:
+                unlinked_books.add(collection_item.get("item_code"))
+                continue
+
+            item.qty_collected = flt(item.qty_collected) + flt(collection_item.get("qty_collected", 0))
+            changed_rows[item.name] = item
+
+        if unlinked_books:
+            expected_qty = get_expected_collected_qty(self.items, get_collected_qty([self.name]))
+            for item in self.items:
+                if item.item_code in unlinked_books and abs(flt(item.qty_collected) - expected_qty[item.name]) > 0.001:
+                    item.qty_collected = expected_qty[item.name]
+                    changed_rows[item.name] = item
+
+        for item in changed_rows.values():
+            item.qty_pending = flt(item.qty) - flt(item.qty_collected)
+            item.collection_status = get_collection_status(item.qty, item.qty_collected)
+
+        return list(changed_rows.values())
+
+
+def on_doctype_update():
+    # Open (submitted, not fully collected) distributions are read by the pending and planning reports
+    frappe.db.add_index("Book Sample Distribution", ["docstatus", "status"])
+
 
+def get_collection_status(qty, qty_collected):
+    """Get the collection status of an item row from its distributed and collected qty"""
+    if flt(qty_collected) <= 0:
+        return "Pending"
+    elif flt(qty_collected) >= flt(qty):
+        return "Collected"
+    return "Partial"
 
-def get_stock_balance(item_code, warehouse):
-    """Get actual stock balance for an item in warehouse"""
-    return flt(frappe.db.get_value(
-        "Bin",
-        {"item_code": item_code, "warehouse": warehouse},
-        "actual_qty"
-    ))
+
+def get_collected_qty(distributions):
+    """Qty of submitted collection lines against the distributions, per book and distribution item row"""
+    return frappe.db.sql("""
+        SELECT
+            bsc.distribution_reference as parent,
+            bsci.item_code,
+            IFNULL(bsci.distribution_item, '') as distribution_item,
+            SUM(COALESCE(bsci.qty_collected, 0) + COALESCE(bsci.qty_damaged, 0) + COALESCE(bsci.qty_lost, 0)) as qty
+        FROM `tabBook Sample Collection` bsc
+        INNER JOIN `tabBook Sample Collection Item` bsci ON bsci.parent = bsc.name
+        WHERE bsc.docstatus = 1
+        AND bsc.distribution_reference IN %(distributions)s
+        GROUP BY bsc.distribution_reference, bsci.item_code, bsci.distribution_item
+    """, {"distributions": tuple(distributions)}, as_dict=True)
+
+
+def get_expected_collected_qty(rows, collected):
+    """Get the qty_collected each distribution item row should have, by row name.
+
+    rows are distribution item rows in idx order, collected the lines from
+    get_collected_qty. Lines referencing one of the rows go to it. The rest
+    only know the book: a title listed twice is filled row by row up to its
+    qty, and the last row takes any excess.
+    """
+    row_names = {row.name for row in rows}
+    linked_qty = defaultdict(float)
+    unlinked_qty = defaultdict(float)
+    for line in collected:
+        if line.distribution_item in row_names:
+            linked_qty[line.distribution_item] += flt(line.qty)
+        else:
+            unlinked_qty[(line.parent, line.item_code)] += flt(line.qty)
+
+    rows_by_book = defaultdict(list)
+    for row in rows:
+        rows_by_book[(row.parent, row.item_code)].append(row)
+
+    expected_qty = {}
+    for book, book_rows in rows_by_book.items():
+        remaining = unlinked_qty[book]
+        for i, row in enumerate(book_rows):
+            if i == len(book_rows) - 1:
+                share = remaining
+            else:
+                share = min(max(flt(row.qty) - linked_qty[row.name], 0), remaining)
+            remaining -= share
+            expected_qty[row.name] = linked_qty[row.name] + share
+
+    return expected_qty
+
+
+@frappe.whitelist()
+def get_items_from_loading(loading):
+    """Get the books of a loading with the quantity still on the van.
+
+    Loaded qty, less submitted distributions made against the loading, plus
+    what their collections brought back into the same van.
+    """
+    loading_doc = frappe.db.get_value(
+        "Book Sample Loading", loading, ["docstatus", "target_warehouse"], as_dict=True
+    )
+    if not loading_doc or loading_doc.docstatus != 1:
+        frappe.throw(_("Loading {0} is not submitted").format(loading))
+
+    return frappe.db.sql("""
+        SELECT
+            t.item_code,
+            MAX(t.item_name) as item_name,
+            MAX(t.class_grade) as class_grade,
+            MAX(t.subject) as subject,
+            MAX(t.stock_uom) as stock_uom,
+            SUM(t.qty) as qty,
+            SUM(t.qty) as available_qty_in_van
+        FROM (
+            SELECT
+                bsli.item_code, bsli.item_name, bsli.class_grade, bsli.subject, bsli.stock_uom,
+                bsli.qty, bsli.idx
+            FROM `tabBook Sample Loading Item` bsli
+            WHERE bsli.parent = %(loading)s
+            AND bsli.parenttype = 'Book Sample Loading'
+
+            UNION ALL
+
+            SELECT bsdi.item_code, NULL, NULL, NULL, NULL, -bsdi.qty, NULL
+            FROM `tabBook Sample Distribution` bsd
+            INNER JOIN `tabBook Sample Distribution Item` bsdi ON bsdi.parent = bsd.name
+            WHERE bsd.loading_reference = %(loading)s
+            AND bsd.docstatus = 1
+
+            UNION ALL
+
+            SELECT bsci.item_code, NULL, NULL, NULL, NULL, bsci.qty_collected, NULL
+            FROM `tabBook Sample Distribution` bsd
+            INNER JOIN `tabBook Sample Collection` bsc ON bsc.distribution_reference = bsd.name
+            INNER JOIN `tabBook Sample Collection Item` bsci ON bsci.parent = bsc.name
+            WHERE bsd.loading_reference = %(loading)s
+            AND bsc.docstatus = 1
+            AND bsc.target_warehouse = %(van_warehouse)s
+        ) t
+        GROUP BY t.item_code
+        HAVING MIN(t.idx) IS NOT NULL AND SUM(t.qty) > 0
+        ORDER BY MIN(t.idx)
+    """, {"loading": loading, "van_warehouse": loading_doc.target_warehouse}, as_dict=True)
 
 
 @frappe.whitelist()
@@ -173,6 +403,7 @@ def get_pending_items_for_collection(distribution):
     for item in doc.items:
         if flt(item.qty_pending) > 0:
             pending_items.append({
+                "distribution_item": item.name,
                 "item_code": item.item_code,
                 "item_name": item.item_name,
                 "class_grade": item.class_grade,
@@ -0,0 +1,52 @@
+// Copyright (c) 2024, Trustbit Software and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings['Book Sample Distribution'] = {
+    onload: function(listview) {
+        listview.page.add_action_item(__('Create Collection'), function() {
+            const selected = listview.get_checked_items();
+            if (selected.length !== 1) {
+                frappe.msgprint(__('Please select exactly one distribution'));
+                return;
+            }
+            frappe.call({
+                method: 'trustbit_school_pro.trustbit_school_pro.doctype.book_sample_collection.book_sample_collection.make_collection_from_distribution',
+                args: { distribution: selected[0].name },
+                callback: function(r) {
+                    if (r.message) {
+                        frappe.model.sync(r.message);
+                        frappe.set_route('Form', 'Book Sample Collection', r.message.name);
+                    }
+                }
+            });
+        });
+
+        listview.page.add_action_item(__('Print Challans'), function() {
+            const names = listview.get_checked_items(true);
+            if (!names.length) {
+                frappe.msgprint(__('Please select at least one distribution'));
+                return;
+            }
+            frappe.call({
+                method: 'trustbit_school_pro.challan.print_challans',
+                args: { names: names }
+            });
+        });
+
+        frappe.realtime.off('challan_pdf_ready');
+        frappe.realtime.on('challan_pdf_ready', function(data) {
+            frappe.msgprint({
+                title: __('Challans Ready'),
+                message: __('{0} challans merged into one PDF: {1}', [
+                    data.count,
+                    `<a href="${data.file_url}" target="_blank">${__('Download')}</a>`
+                ]),
+                indicator: 'green'
+            });
+        });
+
+        frappe.require('sample_forms.bundle.js', function() {
+            trustbit_school_pro.bulk_cancel.setup(listview);
+        });
+    }
+};
@@ -2,24 +2,32 @@
 // For license information, please see license.txt
 
 frappe.ui.form.on('Book Sample Loading', {
+    setup: function(frm) {
+        frappe.require('sample_forms.bundle.js', function() {
+            trustbit_school_pro.sample_forms.set_item_query(frm);
+        });
+    },
+
     refresh: function(frm) {
-        // Update available qty for all items when form is refreshed
-        if (frm.doc.source_warehouse) {
-            frm.doc.items.forEach(function(item, idx) {
-                if (item.item_code) {
-                    update_available_qty(frm, item.item_code, idx);
-                }
+        if (frm.doc.docstatus === 0) {
+            frm.add_custom_button(__('Get Books by Class'), function() {
+                get_books_by_class(frm);
             });
         }
+
+        frappe.require('sample_forms.bundle.js', function() {
+            trustbit_school_pro.sample_forms.add_enrich_button(frm);
+
+            // Update available qty for all items when form is refreshed
+            if (frm.doc.source_warehouse) {
+                trustbit_school_pro.sample_forms.refresh_available_qty(frm);
+            }
+        });
     },
 
     source_warehouse: function(frm) {
         // Update available qty for all items when source warehouse changes
-        frm.doc.items.forEach(function(item, idx) {
-            if (item.item_code) {
-                update_available_qty(frm, item.item_code, idx);
-            }
-        });
+        trustbit_school_pro.sample_forms.refresh_available_qty(frm);
     }
 });
 
@@ -27,27 +35,14 @@ frappe.ui.form.on('Book Sample Loading Item', {
     item_code: function(frm, cdt, cdn) {
         let row = locals[cdt][cdn];
         if (row.item_code) {
-            // Fetch class grades for the item
-            frappe.call({
-                method: 'trustbit_school_pro.trustbit_school_pro.doctype.book_sample_loading.book_sample_loading.get_item_class_grades',
-                args: { item_code: row.item_code },
-                callback: function(r) {
-                    if (r.message !== undefined) {
-                        frappe.model.set_value(cdt, cdn, 'class_grade', r.message);
-                    }
-                }
-            });
-
-            // Fetch available qty
-            if (frm.doc.source_warehouse) {
-                update_available_qty_row(frm, row, cdt, cdn);
-            }
+            // Class grades and available qty are fetched for all changed rows in one request
+            trustbit_school_pro.sample_forms.queue_item_details(frm, cdt, cdn, true);
         }
     },
 
     class_grade: function(frm, cdt, cdn) {
         // Open multiselect dialog when class_grade field is clicked/edited
-        show_class_grade_dialog(frm, cdt, cdn);
+        trustbit_school_pro.sample_forms.show_class_grade_dialog(frm, cdt, cdn);
     },
 
     items_add: function(frm, cdt, cdn) {
@@ -56,87 +51,62 @@ frappe.ui.form.on('Book Sample Loading Item', {
     }
 });
 
-function show_class_grade_dialog(frm, cdt, cdn) {
-    let row = locals[cdt][cdn];
-    let current_values = row.class_grade ? row.class_grade.split(', ').map(v => v.trim()) : [];
-
-    // Fetch all class grades
-    frappe.call({
-        method: 'frappe.client.get_list',
-        args: {
-            doctype: 'Class Grade',
-            filters: { is_active: 1 },
-            fields: ['name', 'class_order'],
-            limit_page_length: 0
-        },
-        callback: function(r) {
-            if (r.message) {
-                // Sort by class_order
-                let sorted = r.message.sort((a, b) => (a.class_order || 0) - (b.class_order || 0));
-
-                // Build HTML checkboxes
-                let html = '<div class="class-grade-grid" style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 10px;">';
-                sorted.forEach(function(cg) {
-                    let checked = current_values.includes(cg.name) ? 'checked' : '';
-                    html += `<label style="display: flex; align-items: center; cursor: pointer;">
-                        <input type="checkbox" class="class-grade-checkbox" value="${cg.name}" ${checked} style="margin-right: 8px;">
-                        ${cg.name}
-                    </label>`;
-                });
-                html += '</div>';
-
-                let d = new frappe.ui.Dialog({
-                    title: __('Select Class/Grade'),
-                    fields: [
-                        {
-                            fieldname: 'class_grades_html',
-                            fieldtype: 'HTML',
-                            options: html
-                        }
-                    ],
-                    primary_action_label: __('Select'),
-                    primary_action: function() {
-                        let selected = [];
-                        d.$wrapper.find('.class-grade-checkbox:checked').each(function() {
-                            selected.push($(this).val());
-                        });
-                        frappe.model.set_value(cdt, cdn, 'class_grade', selected.join(', '));
-                        d.hide();
-                    }
-                });
-                d.show();
-            }
-        }
-    });
-}
-
-function update_available_qty(frm, item_code, idx) {
-    frappe.call({
-        method: 'trustbit_school_pro.trustbit_school_pro.doctype.book_sample_loading.book_sample_loading.get_stock_balance_api',
-        args: {
-            item_code: item_code,
-            warehouse: frm.doc.source_warehouse
-        },
-        callback: function(r) {
-            if (r.message !== undefined) {
-                frm.doc.items[idx].available_qty = r.message;
-                frm.refresh_field('items');
+function get_books_by_class(frm) {
+    let d = new frappe.ui.Dialog({
+        title: __('Get Books by Class'),
+        fields: [
+            {
+                fieldname: 'class_grades',
+                fieldtype: 'MultiSelectList',
+                label: __('Class/Grade'),
+                reqd: 1,
+                get_data: function(txt) {
+                    return frappe.db.get_link_options('Class Grade', txt, { is_active: 1 });
+                }
+            },
+            {
+                fieldname: 'qty',
+                fieldtype: 'Float',
+                label: __('Qty per Book'),
+                default: 1
+            },
+            {
+                fieldname: 'in_stock_only',
+                fieldtype: 'Check',
+                label: __('Only Books in Stock'),
+                default: 1
             }
-        }
-    });
-}
+        ],
+        primary_action_label: __('Get Books'),
+        primary_action: function(values) {
+            frappe.call({
+                method: 'trustbit_school_pro.trustbit_school_pro.doctype.book_sample_loading.book_sample_loading.get_books_by_class',
+                args: {
+                    class_grades: values.class_grades,
+                    warehouse: frm.doc.source_warehouse,
+                    in_stock_only: values.in_stock_only
+                },
+                freeze: true,
+                callback: function(r) {
+                    let books = r.message || [];
+                    if (!books.length) {
+                        frappe.msgprint(__('No books found for the selected classes'));
+                        return;
+                    }
 
-function update_available_qty_row(frm, row, cdt, cdn) {
-    frappe.call({
-        method: 'trustbit_school_pro.trustbit_school_pro.doctype.book_sample_loading.book_sample_loading.get_stock_balance_api',
-        args: {
-            item_code: row.item_code,
-            warehouse: frm.doc.source_warehouse
-        },
-        callback: function(r) {
-            if (r.message !== undefined) {
-                frappe.model.set_value(cdt, cdn, 'available_qty', r.message);
-            }
+                    // Drop empty rows and skip books already in the grid
+                    frm.doc.items = (frm.doc.items || []).filter(item => item.item_code);
+                    let existing = new Set(frm.doc.items.map(item => item.item_code));
+                    books.forEach(function(book) {
+                        if (existing.has(book.item_code)) return;
+                        let row = frm.add_child('items');
+                        Object.assign(row, book, { qty: values.qty || 1 });
+                    });
+                    frm.refresh_field('items');
+                    d.hide();
+                }
+            });
         }
     });
+    d.show();
 }
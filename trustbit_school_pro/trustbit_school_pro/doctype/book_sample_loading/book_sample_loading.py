@@ -4,15 +4,28 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import flt
+from frappe.utils import cint, flt
+
+from trustbit_school_pro.metrics import timed_doc_method
+from trustbit_school_pro.profiling import profile_lifecycle
+from trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle import update_books_on_board
 
 
 class BookSampleLoading(Document):
+    @profile_lifecycle
     def validate(self):
         self.validate_items()
         self.validate_warehouse()
+        if self.docstatus == 0:
+            set_item_details(self, missing_only=True)
         self.calculate_total_qty()
         self.validate_stock_availability()
+        self.validate_vehicle_capacity()
+
+    @frappe.whitelist()
+    def enrich_items(self):
+        """Fill item details and available qty of all rows, for pasted or uploaded rows"""
+        set_item_details(self)
 
     def validate_items(self):
         """Validate that items are provided"""
@@ -41,8 +54,9 @@ class BookSampleLoading(Document):
 
     def validate_stock_availability(self):
         """Check if stock is available in source warehouse"""
+        balances = get_stock_balance_map([item.item_code for item in self.items], self.source_warehouse)
         for item in self.items:
-            available_qty = get_stock_balance(item.item_code, self.source_warehouse)
+            available_qty = balances.get(item.item_code, 0)
             item.available_qty = available_qty
 
             if flt(available_qty) < flt(item.qty):
@@ -54,19 +68,51 @@ class BookSampleLoading(Document):
                     alert=True
                 )
 
+    def validate_vehicle_capacity(self):
+        """Check the load fits in the vehicle, using its cached books on board"""
+        capacity, books_on_board = frappe.db.get_value(
+            "Vehicle", self.vehicle, ["capacity_books", "books_on_board"]
+        ) or (0, 0)
+
+        if not cint(capacity) or flt(books_on_board) + flt(self.total_qty) <= cint(capacity):
+            return
+
+        message = _("Vehicle {0} can carry {1} books. It has {2} on board and this loading adds {3}.").format(
+            self.vehicle, cint(capacity), flt(books_on_board), flt(self.total_qty)
+        )
+
+        # Warn while drafting, block the submit
+        if self.docstatus == 1:
+            frappe.throw(message, title=_("Vehicle Capacity Exceeded"))
+
+        frappe.msgprint(message, indicator="orange", alert=True)
+
+    @profile_lifecycle
+    @timed_doc_method("trustbit_sample_submit_duration_seconds")
     def on_submit(self):
         """Create stock entry on submit"""
         self.create_stock_entry()
+        self.update_vehicle_load()
         self.db_set("status", "Loaded")
 
+    @profile_lifecycle
+    @timed_doc_method("trustbit_sample_cancel_duration_seconds")
     def on_cancel(self):
         """Cancel linked stock entry"""
         if self.stock_entry:
             se = frappe.get_doc("Stock Entry", self.stock_entry)
             if se.docstatus == 1:
                 se.cancel()
+        self.update_vehicle_load(cancel=True)
         self.db_set("status", "Cancelled")
 
+    def update_vehicle_load(self, cancel=False):
+        """Move the loaded quantity into the van's books on board"""
+        qty = -flt(self.total_qty) if cancel else flt(self.total_qty)
+        update_books_on_board(self.target_warehouse, qty)
+        update_books_on_board(self.source_warehouse, -qty)
+
+    @timed_doc_method("trustbit_stock_entry_duration_seconds")
     def create_stock_entry(self):
         """Create Material Transfer Stock Entry"""
         se = frappe.new_doc("Stock Entry")
@@ -119,6 +165,23 @@ def get_stock_balance(item_code, warehouse):
     ))
 
 
+def get_stock_balance_map(item_codes, warehouse):
+    """Get actual stock balance of many items in a warehouse with one Bin query"""
+    item_codes = {item_code for item_code in item_codes if item_code}
+    if not item_codes or not warehouse:
+        return {}
+
+    return {
+        row.item_code: flt(row.actual_qty)
+        for row in frappe.db.sql("""
+            SELECT item_code, actual_qty
+            FROM `tabBin`
+            WHERE warehouse = %(warehouse)s
+            AND item_code IN %(item_codes)s
+        """, {"warehouse": warehouse, "item_codes": tuple(item_codes)}, as_dict=True)
+    }
+
+
 @frappe.whitelist()
 def get_stock_balance_api(item_code, warehouse):
     """API to get stock balance - called from client script"""
@@ -163,3 +226,115 @@ def get_item_class_grades(item_code):
         order_by="idx"
     )
     return ", ".join([cg.class_grade for cg in class_grades]) if class_grades else ""
+
+
+# Item row field -> get_sample_item_details key, for the fields a row has
+ITEM_DETAIL_FIELDS = {
+    "item_name": "item_name",
+    "subject": "subject",
+    "class_grade": "class_grade",
+    "stock_uom": "stock_uom",
+}
+AVAILABLE_QTY_FIELDS = ("available_qty", "available_qty_in_van")
+
+
+def set_item_details(doc, missing_only=False):
+    """Fill item details and available qty of all item rows with one query.
+
+    Existing names, subjects, class grades and UOMs are kept; available qty is
+    refreshed from the source warehouse. With missing_only nothing is fetched
+    unless some row lacks a detail.
+    """
+    rows = [item for item in doc.items if item.item_code]
+    if not rows:
+        return
+
+    meta = frappe.get_meta(rows[0].doctype)
+    detail_fields = [field for field in ITEM_DETAIL_FIELDS if meta.has_field(field)]
+    qty_field = next((field for field in AVAILABLE_QTY_FIELDS if meta.has_field(field)), None)
+
+    if missing_only and not any(not item.get(field) for item in rows for field in detail_fields):
+        return
+
+    details = get_sample_item_details([item.item_code for item in rows], doc.get("source_warehouse"))
+    for item in rows:
+        detail = details.get(item.item_code)
+        if not detail:
+            continue
+
+        for field in detail_fields:
+            if not item.get(field):
+                item.set(field, detail.get(ITEM_DETAIL_FIELDS[field]))
+
+        if qty_field and doc.get("source_warehouse"):
+            item.set(qty_field, flt(detail.available_qty))
+
+
+@frappe.whitelist()
+def get_sample_item_details(item_codes, warehouse=None):
+    """Get name, subject, class grades, UOM and stock in warehouse of many items at once"""
+    item_codes = frappe.parse_json(item_codes) if isinstance(item_codes, str) else item_codes
+    if not item_codes:
+        return {}
+
+    details = frappe.db.sql("""
+        SELECT
+            i.name as item_code,
+            i.item_name,
+            i.custom_subject as subject,
+            i.stock_uom,
+            (
+                SELECT GROUP_CONCAT(icg.class_grade ORDER BY icg.idx SEPARATOR ', ')
+                FROM `tabItem Class Grade` icg
+                WHERE icg.parent = i.name AND icg.parenttype = 'Item'
+            ) as class_grade,
+            COALESCE(b.actual_qty, 0) as available_qty
+        FROM `tabItem` i
+        LEFT JOIN `tabBin` b ON b.item_code = i.name AND b.warehouse = %(warehouse)s
+        WHERE i.name IN %(item_codes)s
+    """, {"item_codes": tuple(set(item_codes)), "warehouse": warehouse}, as_dict=True)
+
+    return {row.item_code: row for row in details}
+
+
+@frappe.whitelist()
+def get_books_by_class(class_grades, warehouse=None, in_stock_only=0):
+    """Get sample books mapped to any of the given class grades with stock in warehouse"""
+    if isinstance(class_grades, str):
+        class_grades = frappe.parse_json(class_grades) if class_grades.startswith("[") else [class_grades]
+
+    if not class_grades:
+        return []
+
+    conditions = ""
+    if cint(in_stock_only) and warehouse:
+        conditions = "AND b.actual_qty > 0"
+
+    # Inner query only touches the (class_grade, parenttype, parent) index
+    return frappe.db.sql("""
+        SELECT
+            i.name as item_code,
+            i.item_name,
+            i.custom_subject as subject,
+            cg.class_grade,
+            i.stock_uom,
+            COALESCE(b.actual_qty, 0) as available_qty
+        FROM (
+            SELECT
+                icg.parent,
+                GROUP_CONCAT(icg.class_grade ORDER BY icg.class_grade SEPARATOR ', ') as class_grade
+            FROM `tabItem Class Grade` icg
+            WHERE icg.class_grade IN %(class_grades)s
+            AND icg.parenttype = 'Item'
+            GROUP BY icg.parent
+        ) cg
+        INNER JOIN `tabItem` i ON i.name = cg.parent
+        LEFT JOIN `tabBin` b ON b.item_code = i.name AND b.warehouse = %(warehouse)s
+        WHERE i.custom_is_sample_book = 1
+        AND i.disabled = 0
+        {conditions}
+        ORDER BY i.custom_subject, i.item_name
+    """.format(conditions=conditions), {
+        "class_grades": tuple(class_grades),
+        "warehouse": warehouse,
+    }, as_dict=True)
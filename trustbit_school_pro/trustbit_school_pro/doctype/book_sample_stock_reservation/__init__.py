@@ -0,0 +1 @@
+# Book Sample Stock Reservation Doctype
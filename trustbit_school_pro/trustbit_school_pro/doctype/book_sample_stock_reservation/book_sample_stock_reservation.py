@@ -0,0 +1,104 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+from collections import defaultdict
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_to_date, cint, flt, now_datetime
+
+
+class BookSampleStockReservation(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("Book Sample Stock Reservation", ["warehouse", "item_code"])
+    frappe.db.add_index("Book Sample Stock Reservation", ["voucher_type", "voucher_no"])
+
+
+def reserve_stock(voucher_type, voucher_no, warehouse, items):
+    """Replace the reservations held by a draft voucher with its current items.
+
+    Reservations last reservation_expiry_hours from School Pro Settings, so a
+    draft nobody saves again stops holding stock.
+    """
+    release_stock(voucher_type, voucher_no)
+    if not warehouse:
+        return
+
+    qty_map = defaultdict(float)
+    for item in items:
+        if item.item_code and flt(item.qty) > 0:
+            qty_map[item.item_code] += flt(item.qty)
+
+    if not qty_map:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    reserved_until = add_to_date(now, hours=get_reservation_expiry_hours())
+    frappe.db.bulk_insert(
+        "Book Sample Stock Reservation",
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by",
+            "voucher_type", "voucher_no", "warehouse", "item_code", "qty", "reserved_until",
+        ],
+        values=[
+            (
+                frappe.generate_hash(length=10), now, now, user, user,
+                voucher_type, voucher_no, warehouse, item_code, qty, reserved_until,
+            )
+            for item_code, qty in qty_map.items()
+        ],
+    )
+
+
+def release_stock(voucher_type, voucher_no):
+    """Drop all reservations held by a voucher"""
+    frappe.db.delete("Book Sample Stock Reservation", {
+        "voucher_type": voucher_type,
+        "voucher_no": voucher_no,
+    })
+
+
+def get_reservation_expiry_hours():
+    return cint(frappe.db.get_single_value("School Pro Settings", "reservation_expiry_hours")) or 24
+
+
+def purge_expired_reservations():
+    """Delete reservations past their reserved_until, run hourly by the scheduler"""
+    frappe.db.sql("""
+        DELETE FROM `tabBook Sample Stock Reservation`
+        WHERE reserved_until IS NULL OR reserved_until < %s
+    """, now_datetime())
+
+
+def get_available_qty_map(warehouse, item_codes, voucher_type=None, voucher_no=None):
+    """Get Bin qty less other vouchers' reservations for items in a warehouse, in one query"""
+    if not warehouse or not item_codes:
+        return {}
+
+    rows = frappe.db.sql("""
+        SELECT
+            i.name as item_code,
+            COALESCE(b.actual_qty, 0) - COALESCE((
+                SELECT SUM(r.qty)
+                FROM `tabBook Sample Stock Reservation` r
+                WHERE r.warehouse = %(warehouse)s
+                AND r.item_code = i.name
+                AND r.reserved_until >= %(now)s
+                AND NOT (r.voucher_type = %(voucher_type)s AND r.voucher_no = %(voucher_no)s)
+            ), 0) as available_qty
+        FROM `tabItem` i
+        LEFT JOIN `tabBin` b ON b.item_code = i.name AND b.warehouse = %(warehouse)s
+        WHERE i.name IN %(item_codes)s
+    """, {
+        "warehouse": warehouse,
+        "item_codes": tuple(item_codes),
+        "voucher_type": voucher_type or "",
+        "voucher_no": voucher_no or "",
+        "now": now_datetime(),
+    }, as_dict=True)
+
+    return {row.item_code: flt(row.available_qty) for row in rows}
@@ -1,8 +1,14 @@
 # Copyright (c) 2024, Trustbit Software and contributors
 # For license information, please see license.txt
 
+import frappe
 from frappe.model.document import Document
 
 
 class ItemClassGrade(Document):
     pass
+
+
+def on_doctype_update():
+    # Covering index for "all books for a class" lookups
+    frappe.db.add_index("Item Class Grade", ["class_grade", "parenttype", "parent"], "class_grade_parent_index")
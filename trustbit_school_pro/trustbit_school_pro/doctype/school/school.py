@@ -1,8 +1,15 @@
 # Copyright (c) 2024, Trustbit Software and contributors
 # For license information, please see license.txt
 
+import csv
+
 import frappe
+from frappe import _
+from frappe.model import no_value_fields
 from frappe.model.document import Document
+from frappe.utils import cint, now_datetime
+
+SCHOOL_IMPORT_BATCH_SIZE = 500
 
 
 class School(Document):
@@ -19,20 +26,36 @@ class School(Document):
         if self.customer:
             frappe.throw("Customer already linked to this school")
 
-        customer = frappe.get_doc({
-            "doctype": "Customer",
-            "customer_name": self.school_name,
-            "customer_type": "Company",
-            "customer_group": frappe.db.get_single_value("Selling Settings", "customer_group") or "All Customer Groups",
-            "territory": frappe.db.get_single_value("Selling Settings", "territory") or "All Territories",
-        })
-        customer.insert(ignore_permissions=True)
+        customer = make_customer(self.school_name, get_customer_defaults())
 
-        self.customer = customer.name
+        self.customer = customer
         self.save()
 
-        frappe.msgprint(f"Customer '{customer.name}' created and linked successfully!")
-        return customer.name
+        frappe.msgprint(f"Customer '{customer}' created and linked successfully!")
+        return customer
+
+
+def get_customer_defaults():
+    """Get customer group and territory for new school customers from Selling Settings"""
+    customer_group, territory = frappe.db.get_value(
+        "Selling Settings", None, ["customer_group", "territory"]
+    )
+    return {
+        "customer_group": customer_group or "All Customer Groups",
+        "territory": territory or "All Territories",
+    }
+
+
+def make_customer(customer_name, defaults):
+    """Create a Company Customer and return its name"""
+    customer = frappe.get_doc({
+        "doctype": "Customer",
+        "customer_name": customer_name,
+        "customer_type": "Company",
+        **defaults,
+    })
+    customer.insert(ignore_permissions=True)
+    return customer.name
 
 
 @frappe.whitelist()
@@ -56,3 +79,146 @@ def get_pending_samples(school):
         AND (bsdi.qty - COALESCE(bsdi.qty_collected, 0)) > 0
         ORDER BY bsd.distribution_date
     """, school, as_dict=True)
+
+
+@frappe.whitelist()
+def import_schools(file_url, create_customers=0):
+    """Queue a bulk School import from an uploaded CSV file"""
+    frappe.only_for(("System Manager", "Stock Manager"))
+
+    frappe.enqueue(
+        "trustbit_school_pro.trustbit_school_pro.doctype.school.school.bulk_import_schools",
+        queue="long",
+        timeout=3600,
+        file_url=file_url,
+        create_customers=cint(create_customers),
+    )
+    frappe.msgprint(_("School import has been queued. You will be notified when it completes."))
+
+
+def bulk_import_schools(file_url, create_customers=0):
+    """Import Schools from a CSV whose headers are School fieldnames.
+
+    Rows are streamed and inserted in batches. Rows whose school_code or
+    school_name + pincode already exist (in the database or earlier in the file)
+    are skipped.
+    """
+    path = frappe.get_doc("File", {"file_url": file_url}).get_full_path()
+    meta = frappe.get_meta("School")
+    columns = [df.fieldname for df in meta.fields if df.fieldtype not in no_value_fields]
+    select_options = {
+        df.fieldname: set((df.options or "").split("\n"))
+        for df in meta.fields if df.fieldtype == "Select"
+    }
+
+    existing_codes, existing_names = set(), {}
+    for school in frappe.db.sql("SELECT name, school_code, pincode FROM `tabSchool`", as_dict=True):
+        if school.school_code:
+            existing_codes.add(school.school_code)
+        existing_names[school.name.lower()] = school.pincode or ""
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        total_rows = max(sum(1 for _ in f) - 1, 1)
+
+    summary = {"imported": 0, "skipped": 0, "errors": []}
+    customer_defaults = None
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        batch = []
+        for row_no, row in enumerate(csv.DictReader(f), start=2):
+            school = {key: (row.get(key) or "").strip() for key in columns}
+            error = validate_import_row(school, select_options)
+            if error:
+                summary["errors"].append(_("Row {0}: {1}").format(row_no, error))
+                continue
+
+            name_key = school["school_name"].lower()
+            if (school["school_code"] and school["school_code"] in existing_codes) or (
+                existing_names.get(name_key) == school["pincode"]
+            ):
+                summary["skipped"] += 1
+                continue
+
+            if name_key in existing_names:
+                summary["errors"].append(
+                    _("Row {0}: School {1} already exists with another pincode").format(
+                        row_no, school["school_name"]
+                    )
+                )
+                continue
+
+            if school["school_code"]:
+                existing_codes.add(school["school_code"])
+            existing_names[name_key] = school["pincode"]
+            batch.append(school)
+
+            if len(batch) >= SCHOOL_IMPORT_BATCH_SIZE:
+                if create_customers and customer_defaults is None:
+                    customer_defaults = get_customer_defaults()
+                insert_school_batch(batch, columns, create_customers, customer_defaults)
+                summary["imported"] += len(batch)
+                batch = []
+                frappe.publish_progress(
+                    row_no * 100 / total_rows,
+                    title=_("Importing Schools"),
+                    description=_("{0} schools imported").format(summary["imported"]),
+                )
+
+        if batch:
+            if create_customers and customer_defaults is None:
+                customer_defaults = get_customer_defaults()
+            insert_school_batch(batch, columns, create_customers, customer_defaults)
+            summary["imported"] += len(batch)
+
+    frappe.publish_progress(100, title=_("Importing Schools"))
+    frappe.publish_realtime("school_import_complete", summary, user=frappe.session.user)
+    return summary
+
+
+def validate_import_row(school, select_options):
+    """Return an error message for an import row, if any"""
+    if not school.get("school_name"):
+        return _("School Name is required")
+
+    for fieldname, options in select_options.items():
+        if school.get(fieldname) and school[fieldname] not in options:
+            return _("{0} is not a valid {1}").format(school[fieldname], fieldname)
+
+    if school.get("is_active") == "":
+        school["is_active"] = 1
+
+
+def insert_school_batch(schools, columns, create_customers=0, customer_defaults=None):
+    """Bulk insert a batch of schools and create their customers, then commit"""
+    now = now_datetime()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "School",
+        fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx"] + columns,
+        values=[
+            [school["school_name"], now, now, user, user, 0, 0] + [school.get(key) or None for key in columns]
+            for school in schools
+        ],
+    )
+
+    if create_customers:
+        link_customers([school["school_name"] for school in schools if not school.get("customer")], customer_defaults)
+
+    frappe.db.commit()
+
+
+def link_customers(school_names, customer_defaults):
+    """Create or reuse a Customer for each school and link them in one update"""
+    if not school_names:
+        return
+
+    existing = set(frappe.get_all(
+        "Customer", filters={"name": ["in", school_names]}, pluck="name"
+    ))
+
+    customers = {}
+    for school_name in school_names:
+        customer = school_name if school_name in existing else make_customer(school_name, customer_defaults)
+        customers[school_name] = {"customer": customer}
+
+    frappe.db.bulk_update("School", customers, update_modified=False)
@@ -0,0 +1,52 @@
+// Copyright (c) 2024, Trustbit Software and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings['School'] = {
+    onload: function(listview) {
+        listview.page.add_menu_item(__('Bulk Import Schools'), function() {
+            show_bulk_import_dialog(listview);
+        });
+    }
+};
+
+function show_bulk_import_dialog(listview) {
+    let d = new frappe.ui.Dialog({
+        title: __('Bulk Import Schools'),
+        fields: [
+            {
+                fieldname: 'file_url',
+                fieldtype: 'Attach',
+                label: __('CSV File'),
+                description: __('Column headers must be School field names, e.g. school_name, school_code, city, pincode'),
+                reqd: 1
+            },
+            {
+                fieldname: 'create_customers',
+                fieldtype: 'Check',
+                label: __('Create Customers')
+            }
+        ],
+        primary_action_label: __('Import'),
+        primary_action: function(values) {
+            frappe.call({
+                method: 'trustbit_school_pro.trustbit_school_pro.doctype.school.school.import_schools',
+                args: values,
+                callback: function() {
+                    d.hide();
+                }
+            });
+        }
+    });
+
+    frappe.realtime.off('school_import_complete');
+    frappe.realtime.on('school_import_complete', function(summary) {
+        let message = __('{0} schools imported, {1} duplicates skipped', [summary.imported, summary.skipped]);
+        if (summary.errors.length) {
+            message += '<br><br>' + summary.errors.slice(0, 50).map(frappe.utils.escape_html).join('<br>');
+        }
+        frappe.msgprint({ title: __('School Import'), message: message, indicator: summary.errors.length ? 'orange' : 'green' });
+        listview.refresh();
+    });
+
+    d.show();
+}
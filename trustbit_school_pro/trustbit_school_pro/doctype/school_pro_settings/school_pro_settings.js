@@ -0,0 +1,21 @@
+// Copyright (c) 2024, Trustbit Software and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('School Pro Settings', {
+    refresh: function(frm) {
+        if (frm.doc.field_warehouse_sharding && !frm.is_dirty()) {
+            frm.add_custom_button(__('Create Field Warehouses'), function() {
+                frm.call({
+                    doc: frm.doc,
+                    method: 'create_field_warehouses',
+                    freeze: true,
+                    freeze_message: __('Creating field warehouses...'),
+                    callback: function(r) {
+                        frappe.msgprint(__('{0} field warehouse(s) created', [(r.message || []).length]));
+                        frm.reload_doc();
+                    }
+                });
+            });
+        }
+    }
+});
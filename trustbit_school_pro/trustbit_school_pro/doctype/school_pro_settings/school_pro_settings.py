@@ -0,0 +1,151 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+
+from trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle import get_vehicle_warehouse_defaults
+
+FIELD_WAREHOUSE_NAME = "Samples in Field"
+FIELD_WAREHOUSE_GROUP_NAME = "Samples in Field Group"
+FIELD_WAREHOUSE_CACHE_KEY = "trustbit_field_warehouse"
+
+
+class SchoolProSettings(Document):
+    def validate(self):
+        if not self.field_warehouse:
+            self.field_warehouse = get_default_field_warehouse()
+
+    def on_update(self):
+        clear_field_warehouse_cache()
+
+    @frappe.whitelist()
+    def create_field_warehouses(self):
+        """Create the group warehouse and the shards missing for any area/zone or vehicle"""
+        if not self.field_warehouse_sharding:
+            frappe.throw(_("Select what to shard the field warehouse by first"))
+
+        if not self.field_warehouse_group:
+            defaults = get_vehicle_warehouse_defaults()
+            group = frappe.db.get_value(
+                "Warehouse", {"warehouse_name": FIELD_WAREHOUSE_GROUP_NAME, "company": defaults.company}
+            )
+            if not group:
+                group = make_field_warehouse(
+                    FIELD_WAREHOUSE_GROUP_NAME, defaults.company, defaults.parent_warehouse, is_group=1
+                )
+            self.db_set("field_warehouse_group", group)
+
+        self.move_field_warehouse_to_group()
+
+        company = frappe.db.get_value("Warehouse", self.field_warehouse_group, "company")
+        existing = set(frappe.get_all(
+            "Warehouse", filters={"parent_warehouse": self.field_warehouse_group}, pluck="warehouse_name"
+        ))
+
+        created = []
+        for key in get_shard_keys(self.field_warehouse_sharding):
+            warehouse_name = get_shard_warehouse_name(key)
+            if warehouse_name not in existing:
+                created.append(make_field_warehouse(warehouse_name, company, self.field_warehouse_group))
+
+        clear_field_warehouse_cache()
+        return created
+
+    def move_field_warehouse_to_group(self):
+        """Put the default field warehouse under the group, so the group's stock covers all field stock"""
+        if not self.field_warehouse:
+            return
+
+        warehouse = frappe.get_doc("Warehouse", self.field_warehouse)
+        if warehouse.parent_warehouse == self.field_warehouse_group:
+            return
+
+        if warehouse.company != frappe.db.get_value("Warehouse", self.field_warehouse_group, "company"):
+            frappe.msgprint(
+                _("Default field warehouse {0} belongs to another company and stays outside {1}").format(
+                    self.field_warehouse, self.field_warehouse_group
+                ),
+                indicator="orange",
+            )
+            return
+
+        warehouse.parent_warehouse = self.field_warehouse_group
+        warehouse.save(ignore_permissions=True)
+
+
+def get_field_warehouse(school=None, vehicle=None):
+    """Get the field warehouse a distribution to the school goes into.
+
+    With sharding on this is the shard of the school's area/zone or of the
+    vehicle, once it has been created, otherwise the default field warehouse.
+    """
+    settings = frappe.get_cached_doc("School Pro Settings")
+    key = get_shard_key(settings.field_warehouse_sharding, school, vehicle)
+
+    if key and settings.field_warehouse_group:
+        warehouse = frappe.cache().hget(
+            FIELD_WAREHOUSE_CACHE_KEY,
+            key,
+            generator=lambda: frappe.db.get_value(
+                "Warehouse",
+                {
+                    "parent_warehouse": settings.field_warehouse_group,
+                    "warehouse_name": get_shard_warehouse_name(key),
+                    "disabled": 0,
+                },
+            ),
+        )
+        if warehouse:
+            return warehouse
+
+    return settings.field_warehouse or get_default_field_warehouse()
+
+
+def clear_field_warehouse_cache(doc=None, method=None):
+    """Drop cached shard lookups when a Warehouse is saved, renamed or deleted"""
+    frappe.cache().delete_key(FIELD_WAREHOUSE_CACHE_KEY)
+
+
+def get_default_field_warehouse():
+    return frappe.db.get_value("Warehouse", {"warehouse_name": FIELD_WAREHOUSE_NAME, "is_group": 0})
+
+
+def get_shard_key(sharding, school=None, vehicle=None):
+    if sharding == "Area Zone" and school:
+        return frappe.get_cached_value("School", school, "area_zone")
+
+    if sharding == "Vehicle":
+        return vehicle
+
+
+def get_shard_keys(sharding):
+    """Area/zones of active schools or active vehicles, each of which gets a shard"""
+    if sharding == "Area Zone":
+        return frappe.db.sql_list("""
+            SELECT DISTINCT area_zone
+            FROM `tabSchool`
+            WHERE is_active = 1
+            AND IFNULL(area_zone, '') != ''
+            ORDER BY area_zone
+        """)
+
+    return frappe.get_all("Vehicle", filters={"is_active": 1}, pluck="name", order_by="name")
+
+
+def get_shard_warehouse_name(key):
+    return f"{FIELD_WAREHOUSE_NAME} - {key}"
+
+
+def make_field_warehouse(warehouse_name, company, parent_warehouse, is_group=0):
+    """Insert a field warehouse and return its name"""
+    warehouse = frappe.get_doc({
+        "doctype": "Warehouse",
+        "warehouse_name": warehouse_name,
+        "company": company,
+        "is_group": is_group,
+        "parent_warehouse": parent_warehouse,
+    })
+    warehouse.insert(ignore_permissions=True)
+    return warehouse.name
@@ -0,0 +1,43 @@
+// Copyright (c) 2024, Trustbit Software and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on('Vehicle', {
+    refresh: function(frm) {
+        if (!frm.is_new() && frm.doc.warehouse) {
+            frm.add_custom_button(__('Live Stock'), function() {
+                frappe.require('sample_forms.bundle.js', function() {
+                    show_live_stock(frm);
+                });
+            });
+        }
+    }
+});
+
+function show_live_stock(frm) {
+    let d = new frappe.ui.Dialog({
+        title: __('Stock in {0}', [frm.doc.vehicle_number]),
+        fields: [{ fieldname: 'stock_html', fieldtype: 'HTML' }],
+        on_hide: function() {
+            trustbit_school_pro.van_stock.unwatch(frm.doc.name);
+        }
+    });
+
+    trustbit_school_pro.van_stock.watch(frm.doc.name, function(items) {
+        let rows = items.map(item => `<tr>
+            <td>${frappe.utils.escape_html(item.item_code)}</td>
+            <td>${frappe.utils.escape_html(item.item_name || '')}</td>
+            <td class="text-right">${item.actual_qty}</td>
+            <td>${item.stock_uom || ''}</td>
+        </tr>`).join('');
+
+        d.fields_dict.stock_html.$wrapper.html(`<table class="table table-bordered table-sm">
+            <thead><tr>
+                <th>${__('Book')}</th><th>${__('Book Name')}</th>
+                <th class="text-right">${__('Qty')}</th><th>${__('UOM')}</th>
+            </tr></thead>
+            <tbody>${rows || `<tr><td colspan="4" class="text-muted">${__('No stock')}</td></tr>`}</tbody>
+        </table>`);
+    });
+
+    d.show();
+}
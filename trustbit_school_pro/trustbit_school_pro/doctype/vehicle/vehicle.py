@@ -1,8 +1,17 @@
 # Copyright (c) 2024, Trustbit Software and contributors
 # For license information, please see license.txt
 
+from functools import partial
+
 import frappe
 from frappe.model.document import Document
+from frappe.utils import cint, flt
+
+from trustbit_school_pro.metrics import record_cache_lookup
+
+VEHICLE_STOCK_CACHE_KEY = "trustbit_vehicle_stock"
+# Bumped on every stock movement of a vehicle warehouse
+VEHICLE_STOCK_VERSION_KEY = "trustbit_vehicle_stock_version"
 
 
 class Vehicle(Document):
@@ -17,52 +26,140 @@ def create_vehicle_warehouse(doc, method):
     if doc.warehouse:
         return
 
-    # Get default company
-    company = frappe.db.get_single_value("Global Defaults", "default_company")
-    if not company:
-        company = frappe.db.get_value("Company", {}, "name")
-
-    if not company:
-        frappe.throw("Please set up a company first")
-
-    company_abbr = frappe.db.get_value("Company", company, "abbr")
+    defaults = get_vehicle_warehouse_defaults()
     warehouse_name = f"Van - {doc.vehicle_number}"
 
     # Check if warehouse already exists
-    existing = frappe.db.exists("Warehouse", {"warehouse_name": warehouse_name})
+    existing = frappe.db.exists("Warehouse", {"warehouse_name": warehouse_name, "company": defaults.company})
     if existing:
         doc.warehouse = existing
         doc.db_set("warehouse", existing)
         return
 
     # Create new warehouse
+    warehouse = make_vehicle_warehouse(warehouse_name, defaults)
+
+    doc.warehouse = warehouse
+    doc.db_set("warehouse", warehouse)
+
+    frappe.msgprint(
+        f"Warehouse '{warehouse}' created for vehicle {doc.vehicle_number}",
+        indicator="green",
+        alert=True
+    )
+
+
+def get_vehicle_warehouse_defaults():
+    """Get the company and parent warehouse under which van warehouses are created"""
+    company = frappe.db.get_single_value("Global Defaults", "default_company")
+    if not company:
+        company = frappe.db.get_value("Company", {}, "name")
+
+    if not company:
+        frappe.throw("Please set up a company first")
+
+    company_abbr = frappe.get_cached_value("Company", company, "abbr")
+    return frappe._dict({
+        "company": company,
+        "parent_warehouse": f"All Warehouses - {company_abbr}",
+    })
+
+
+def make_vehicle_warehouse(warehouse_name, defaults):
+    """Insert a van warehouse and return its name"""
     warehouse = frappe.get_doc({
         "doctype": "Warehouse",
         "warehouse_name": warehouse_name,
-        "company": company,
+        "company": defaults.company,
         "is_group": 0,
-        "parent_warehouse": f"All Warehouses - {company_abbr}",
+        "parent_warehouse": defaults.parent_warehouse,
     })
     warehouse.insert(ignore_permissions=True)
+    return warehouse.name
 
-    doc.warehouse = warehouse.name
-    doc.db_set("warehouse", warehouse.name)
 
-    frappe.msgprint(
-        f"Warehouse '{warehouse.name}' created for vehicle {doc.vehicle_number}",
-        indicator="green",
-        alert=True
-    )
+@frappe.whitelist()
+def bulk_create_vehicles(vehicles):
+    """Create vehicles and their van warehouses in one batch.
+
+    vehicles is a list of Vehicle field dicts with at least vehicle_number.
+    Vehicles and warehouses that already exist are reused, so re-running on a
+    partly imported fleet only creates what is missing.
+    """
+    frappe.only_for(("System Manager", "Stock Manager"))
+
+    vehicles = {
+        row["vehicle_number"].strip(): row
+        for row in frappe.parse_json(vehicles)
+        if (row.get("vehicle_number") or "").strip()
+    }
+    if not vehicles:
+        return {"created": [], "linked": [], "skipped": []}
+
+    defaults = get_vehicle_warehouse_defaults()
+    existing_vehicles = dict(frappe.get_all(
+        "Vehicle",
+        filters={"name": ["in", list(vehicles)]},
+        fields=["name", "warehouse"],
+        as_list=True,
+    ))
+    warehouses = dict(frappe.get_all(
+        "Warehouse",
+        filters={
+            "warehouse_name": ["in", [f"Van - {number}" for number in vehicles]],
+            "company": defaults.company,
+        },
+        fields=["warehouse_name", "name"],
+        as_list=True,
+    ))
+
+    result = {"created": [], "linked": [], "skipped": []}
+    to_link = {}
+    for number, row in vehicles.items():
+        if existing_vehicles.get(number):
+            result["skipped"].append(number)
+            continue
+
+        warehouse_name = f"Van - {number}"
+        if warehouse_name not in warehouses:
+            warehouses[warehouse_name] = make_vehicle_warehouse(warehouse_name, defaults)
+
+        if number in existing_vehicles:
+            to_link[number] = {"warehouse": warehouses[warehouse_name]}
+            result["linked"].append(number)
+            continue
+
+        # Warehouse is set up front so after_insert has nothing left to do
+        frappe.get_doc({
+            **row,
+            "doctype": "Vehicle",
+            "vehicle_number": number,
+            "warehouse": warehouses[warehouse_name],
+        }).insert()
+        result["created"].append(number)
+
+    if to_link:
+        frappe.db.bulk_update("Vehicle", to_link)
+
+    return result
 
 
 @frappe.whitelist()
 def get_vehicle_stock(vehicle):
-    """Get current stock in vehicle warehouse"""
-    warehouse = frappe.db.get_value("Vehicle", vehicle, "warehouse")
+    """Get current stock in vehicle warehouse, served from cache between stock movements"""
+    warehouse = frappe.get_cached_value("Vehicle", vehicle, "warehouse")
     if not warehouse:
         return []
 
-    return frappe.db.sql("""
+    # Read before the query, so a snapshot taken across a stock movement is stored under the old version
+    version = get_vehicle_stock_version(warehouse)
+    cached = frappe.cache().hget(VEHICLE_STOCK_CACHE_KEY, warehouse)
+    hit = isinstance(cached, dict) and cached.get("version") == version
+    record_cache_lookup("vehicle_stock", hit)
+    if hit:
+        return cached["stock"]
+
+    stock = frappe.db.sql("""
         SELECT
             item_code,
             item_name,
@@ -73,3 +170,106 @@ def get_vehicle_stock(vehicle):
         AND actual_qty > 0
         ORDER BY item_code
     """, warehouse, as_dict=True)
+    frappe.cache().hset(VEHICLE_STOCK_CACHE_KEY, warehouse, {"version": version, "stock": stock})
+
+    return stock
+
+
+def get_vehicle_stock_version(warehouse):
+    cache = frappe.cache()
+    # Raw HGET, the counter is a plain integer kept by HINCRBY
+    return cint(cache.execute_command("HGET", cache.make_key(VEHICLE_STOCK_VERSION_KEY), warehouse))
+
+
+def publish_vehicle_stock_update(doc, method):
+    """Push van stock deltas to watchers when a sample Stock Entry is submitted or cancelled"""
+    if not (
+        doc.get("custom_book_sample_loading")
+        or doc.get("custom_book_sample_distribution")
+        or doc.get("custom_book_sample_collection")
+    ):
+        return
+
+    sign = -1 if doc.docstatus == 2 else 1
+    deltas = {}
+    for item in doc.items:
+        qty = flt(item.transfer_qty) or flt(item.qty)
+        for warehouse, item_qty in ((item.s_warehouse, -qty), (item.t_warehouse, qty)):
+            if not warehouse:
+                continue
+            row = deltas.setdefault(warehouse, {}).setdefault(item.item_code, frappe._dict({
+                "item_code": item.item_code,
+                "item_name": item.item_name,
+                "actual_qty": 0,
+                "stock_uom": item.stock_uom,
+            }))
+            row.actual_qty += sign * item_qty
+
+    if not deltas:
+        return
+
+    vehicles = frappe.get_all(
+        "Vehicle",
+        filters={"warehouse": ["in", list(deltas)]},
+        fields=["name", "warehouse"],
+    )
+    for vehicle in vehicles:
+        frappe.db.after_commit.add(partial(clear_vehicle_stock_cache, vehicle.warehouse))
+        frappe.publish_realtime(
+            "vehicle_stock_update",
+            {
+                "vehicle": vehicle.name,
+                "stock_entry": doc.name,
+                "items": list(deltas[vehicle.warehouse].values()),
+            },
+            doctype="Vehicle",
+            docname=vehicle.name,
+            after_commit=True,
+        )
+
+
+def clear_vehicle_stock_cache(warehouse):
+    """Drop the cached stock snapshot of a vehicle warehouse.
+
+    The version bump also makes stale a snapshot that a concurrent
+    get_vehicle_stock read before this movement and stores after the delete.
+    """
+    cache = frappe.cache()
+    cache.execute_command("HINCRBY", cache.make_key(VEHICLE_STOCK_VERSION_KEY), warehouse, 1)
+    cache.hdel(VEHICLE_STOCK_CACHE_KEY, warehouse)
+
+
+def update_books_on_board(warehouse, qty):
+    """Add qty to books on board of the vehicle that uses this warehouse"""
+    if not warehouse or not flt(qty):
+        return
+
+    # Single atomic increment so concurrent submits don't overwrite each other
+    frappe.db.sql("""
+        UPDATE `tabVehicle`
+        SET books_on_board = COALESCE(books_on_board, 0) + %s
+        WHERE warehouse = %s
+    """, (flt(qty), warehouse))
+
+
+def reconcile_books_on_board(vehicle=None):
+    """Reset books on board from tabBin and return the vehicles that were out of sync"""
+    conditions = "AND v.name = %(vehicle)s" if vehicle else ""
+
+    mismatches = frappe.db.sql("""
+        SELECT
+            v.name as vehicle,
+            COALESCE(v.books_on_board, 0) as books_on_board,
+            COALESCE(SUM(b.actual_qty), 0) as actual_qty
+        FROM `tabVehicle` v
+        LEFT JOIN `tabBin` b ON b.warehouse = v.warehouse
+        WHERE IFNULL(v.warehouse, '') != ''
+        {conditions}
+        GROUP BY v.name, v.books_on_board
+        HAVING ABS(books_on_board - actual_qty) > 0.001
+    """.format(conditions=conditions), {"vehicle": vehicle}, as_dict=True)
+
+    for row in mismatches:
+        frappe.db.set_value("Vehicle", row.vehicle, "books_on_board", row.actual_qty, update_modified=False)
+
+    return mismatches
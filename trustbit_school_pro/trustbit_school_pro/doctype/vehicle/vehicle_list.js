@@ -0,0 +1,50 @@
+// Copyright (c) 2024, Trustbit Software and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings['Vehicle'] = {
+    onload: function(listview) {
+        listview.page.add_menu_item(__('Bulk Add Vehicles'), function() {
+            show_bulk_vehicle_dialog(listview);
+        });
+    }
+};
+
+function show_bulk_vehicle_dialog(listview) {
+    let d = new frappe.ui.Dialog({
+        title: __('Bulk Add Vehicles'),
+        size: 'large',
+        fields: [
+            {
+                fieldname: 'vehicles',
+                fieldtype: 'Table',
+                label: __('Vehicles'),
+                cannot_add_rows: false,
+                in_place_edit: true,
+                data: [],
+                fields: [
+                    { fieldname: 'vehicle_number', fieldtype: 'Data', label: __('Vehicle Number'), in_list_view: 1, reqd: 1 },
+                    { fieldname: 'vehicle_type', fieldtype: 'Select', label: __('Vehicle Type'), options: '\nVan\nTruck\nTempo\nBike\nCar\nOther', in_list_view: 1 },
+                    { fieldname: 'capacity_books', fieldtype: 'Int', label: __('Capacity (No. of Books)'), in_list_view: 1 },
+                    { fieldname: 'driver_name', fieldtype: 'Data', label: __('Driver Name'), in_list_view: 1 }
+                ]
+            }
+        ],
+        primary_action_label: __('Create'),
+        primary_action: function(values) {
+            frappe.call({
+                method: 'trustbit_school_pro.trustbit_school_pro.doctype.vehicle.vehicle.bulk_create_vehicles',
+                args: { vehicles: values.vehicles || [] },
+                freeze: true,
+                callback: function(r) {
+                    let result = r.message;
+                    frappe.msgprint(__('{0} created, {1} linked to existing warehouses, {2} already set up', [
+                        result.created.length, result.linked.length, result.skipped.length
+                    ]));
+                    d.hide();
+                    listview.refresh();
+                }
+            });
+        }
+    });
+    d.show();
+}
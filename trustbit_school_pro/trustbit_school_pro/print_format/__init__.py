@@ -0,0 +1 @@
+# Print Formats
@@ -0,0 +1 @@
+# Book Sample Challan Print Format
@@ -1,11 +1,25 @@
 # Copyright (c) 2024, Trustbit Software and contributors
 # For license information, please see license.txt
 
-import frappe
 from frappe import _
-from frappe.utils import flt
 
+from trustbit_school_pro.ledger import get_ledger_entries
+from trustbit_school_pro.metrics import timed
 
+# Running balance per book: loadings and distributions take books out, collections bring them back
+LEDGER = {
+    "qty_fields": {
+        "Book Sample Loading": "qty_out",
+        "Book Sample Distribution": "qty_out",
+        "Book Sample Collection": "qty_in",
+    },
+    "signs": {"qty_in": 1, "qty_out": -1},
+    "balance_key": ("item_code",),
+    "order_by": ("date", "voucher_no"),
+}
+
+
+@timed("trustbit_report_duration_seconds", report="book_sample_ledger")
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
@@ -95,131 +109,4 @@ def get_columns():
 
 
 def get_data(filters):
-    conditions = get_conditions(filters)
-    data = []
-
-    # Get Loading entries (books loaded to van - OUT from source, IN to van)
-    loading_data = frappe.db.sql("""
-        SELECT
-            bsl.loading_date as date,
-            'Book Sample Loading' as voucher_type,
-            bsl.name as voucher_no,
-            bsli.item_code,
-            bsli.item_name,
-            bsli.class_grade,
-            NULL as school,
-            bsl.vehicle,
-            bsli.qty as qty_out,
-            0 as qty_in,
-            bsl.source_warehouse as warehouse,
-            'Loading to Van' as remarks
-        FROM `tabBook Sample Loading` bsl
-        INNER JOIN `tabBook Sample Loading Item` bsli ON bsli.parent = bsl.name
-        WHERE bsl.docstatus = 1
-        {conditions}
-        ORDER BY bsl.loading_date, bsl.creation
-    """.format(conditions=conditions.get("loading", "")), filters, as_dict=True)
-
-    # Get Distribution entries (books distributed to school - OUT from van)
-    distribution_data = frappe.db.sql("""
-        SELECT
-            bsd.distribution_date as date,
-            'Book Sample Distribution' as voucher_type,
-            bsd.name as voucher_no,
-            bsdi.item_code,
-            bsdi.item_name,
-            bsdi.class_grade,
-            bsd.school,
-            bsd.vehicle,
-            0 as qty_in,
-            bsdi.qty as qty_out,
-            bsd.source_warehouse as warehouse,
-            'Distributed to School' as remarks
-        FROM `tabBook Sample Distribution` bsd
-        INNER JOIN `tabBook Sample Distribution Item` bsdi ON bsdi.parent = bsd.name
-        WHERE bsd.docstatus = 1
-        {conditions}
-        ORDER BY bsd.distribution_date, bsd.creation
-    """.format(conditions=conditions.get("distribution", "")), filters, as_dict=True)
-
-    # Get Collection entries (books collected from school - IN to van/warehouse)
-    collection_data = frappe.db.sql("""
-        SELECT
-            bsc.collection_date as date,
-            'Book Sample Collection' as voucher_type,
-            bsc.name as voucher_no,
-            bsci.item_code,
-            bsci.item_name,
-            bsci.class_grade,
-            bsc.school,
-            NULL as vehicle,
-            bsci.qty_collected as qty_in,
-            0 as qty_out,
-            bsc.target_warehouse as warehouse,
-            'Collected from School' as remarks
-        FROM `tabBook Sample Collection` bsc
-        INNER JOIN `tabBook Sample Collection Item` bsci ON bsci.parent = bsc.name
-        WHERE bsc.docstatus = 1
-        AND bsci.qty_collected > 0
-        {conditions}
-        ORDER BY bsc.collection_date, bsc.creation
-    """.format(conditions=conditions.get("collection", "")), filters, as_dict=True)
-
-    # Combine all data
-    all_data = loading_data + distribution_data + collection_data
-
-    # Sort by date
-    all_data.sort(key=lambda x: (x.get("date") or "", x.get("voucher_no") or ""))
-
-    # Calculate running balance per item
-    item_balances = {}
-    for row in all_data:
-        item = row.get("item_code")
-        if item not in item_balances:
-            item_balances[item] = 0
-
-        qty_in = flt(row.get("qty_in", 0))
-        qty_out = flt(row.get("qty_out", 0))
-        item_balances[item] += qty_in - qty_out
-        row["balance"] = item_balances[item]
-        data.append(row)
-
-    return data
-
-
-def get_conditions(filters):
-    conditions = {
-        "loading": [],
-        "distribution": [],
-        "collection": []
-    }
-
-    if filters.get("from_date"):
-        conditions["loading"].append("AND bsl.loading_date >= %(from_date)s")
-        conditions["distribution"].append("AND bsd.distribution_date >= %(from_date)s")
-        conditions["collection"].append("AND bsc.collection_date >= %(from_date)s")
-
-    if filters.get("to_date"):
-        conditions["loading"].append("AND bsl.loading_date <= %(to_date)s")
-        conditions["distribution"].append("AND bsd.distribution_date <= %(to_date)s")
-        conditions["collection"].append("AND bsc.collection_date <= %(to_date)s")
-
-    if filters.get("item_code"):
-        conditions["loading"].append("AND bsli.item_code = %(item_code)s")
-        conditions["distribution"].append("AND bsdi.item_code = %(item_code)s")
-        conditions["collection"].append("AND bsci.item_code = %(item_code)s")
-
-    if filters.get("vehicle"):
-        conditions["loading"].append("AND bsl.vehicle = %(vehicle)s")
-        conditions["distribution"].append("AND bsd.vehicle = %(vehicle)s")
-        # Note: Book Sample Collection doesn't have vehicle field
-
-    if filters.get("school"):
-        conditions["distribution"].append("AND bsd.school = %(school)s")
-        conditions["collection"].append("AND bsc.school = %(school)s")
-
-    return {
-        "loading": " ".join(conditions["loading"]),
-        "distribution": " ".join(conditions["distribution"]),
-        "collection": " ".join(conditions["collection"])
-    }
+    return get_ledger_entries(LEDGER, filters)
@@ -5,7 +5,10 @@ import frappe
 from frappe import _
 from frappe.utils import getdate, date_diff
 
+from trustbit_school_pro.metrics import timed
 
+
+@timed("trustbit_report_duration_seconds", report="pending_sample_collection")
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
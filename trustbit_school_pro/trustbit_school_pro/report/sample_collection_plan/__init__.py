@@ -0,0 +1 @@
+# Sample Collection Plan Report
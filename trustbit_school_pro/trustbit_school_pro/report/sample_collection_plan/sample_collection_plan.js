@@ -0,0 +1,33 @@
+// Copyright (c) 2024, Trustbit Software and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Sample Collection Plan"] = {
+    "filters": [
+        {
+            "fieldname": "due_by",
+            "label": __("Due By"),
+            "fieldtype": "Date",
+            "default": frappe.datetime.get_today()
+        },
+        {
+            "fieldname": "area_zone",
+            "label": __("Area/Zone"),
+            "fieldtype": "Data"
+        },
+        {
+            "fieldname": "vehicle",
+            "label": __("Vehicle"),
+            "fieldtype": "Link",
+            "options": "Vehicle"
+        }
+    ],
+    "formatter": function(value, row, column, data, default_formatter) {
+        value = default_formatter(value, row, column, data);
+
+        if (column.fieldname == "vehicle" && data && !data.vehicle) {
+            value = "<span style='color:red; font-weight:bold'>" + __("Unassigned") + "</span>";
+        }
+
+        return value;
+    }
+};
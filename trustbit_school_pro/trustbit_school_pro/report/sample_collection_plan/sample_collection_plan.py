@@ -0,0 +1,292 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+import math
+from collections import OrderedDict
+
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from trustbit_school_pro.metrics import timed
+
+EARTH_RADIUS_KM = 6371.0
+
+
+@timed("trustbit_report_duration_seconds", report="sample_collection_plan")
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+    columns = get_columns()
+    data = get_data(filters)
+    return columns, data
+
+
+def get_columns():
+    return [
+        {
+            "fieldname": "vehicle",
+            "label": _("Vehicle"),
+            "fieldtype": "Link",
+            "options": "Vehicle",
+            "width": 120
+        },
+        {
+            "fieldname": "stop",
+            "label": _("Stop"),
+            "fieldtype": "Int",
+            "width": 60
+        },
+        {
+            "fieldname": "school",
+            "label": _("School"),
+            "fieldtype": "Link",
+            "options": "School",
+            "width": 150
+        },
+        {
+            "fieldname": "school_name",
+            "label": _("School Name"),
+            "fieldtype": "Data",
+            "width": 180
+        },
+        {
+            "fieldname": "area_zone",
+            "label": _("Area/Zone"),
+            "fieldtype": "Data",
+            "width": 100
+        },
+        {
+            "fieldname": "pincode",
+            "label": _("Pincode"),
+            "fieldtype": "Data",
+            "width": 80
+        },
+        {
+            "fieldname": "qty_pending",
+            "label": _("Pending"),
+            "fieldtype": "Float",
+            "width": 80
+        },
+        {
+            "fieldname": "van_load",
+            "label": _("Van Load"),
+            "fieldtype": "Float",
+            "width": 90
+        },
+        {
+            "fieldname": "distributions",
+            "label": _("Distributions"),
+            "fieldtype": "Int",
+            "width": 100
+        },
+        {
+            "fieldname": "expected_return_date",
+            "label": _("Return Date"),
+            "fieldtype": "Date",
+            "width": 100
+        },
+        {
+            "fieldname": "distance_km",
+            "label": _("Km from Previous"),
+            "fieldtype": "Float",
+            "precision": 1,
+            "width": 110
+        }
+    ]
+
+
+def get_data(filters):
+    schools = get_pending_schools(filters)
+    vehicles = get_available_vehicles(filters)
+
+    data = []
+    for vehicle, stops in assign_vehicles(schools, vehicles).items():
+        van_load = flt(vehicles[vehicle].books_on_board) if vehicle in vehicles else 0
+        previous = None
+        for i, school in enumerate(order_stops(stops) if vehicle else stops, 1):
+            van_load += flt(school.qty_pending)
+            school.update({
+                "vehicle": vehicle,
+                "stop": i if vehicle else None,
+                "van_load": van_load if vehicle else None,
+                "distance_km": get_distance(previous, school) if vehicle else None,
+            })
+            if has_coordinates(school):
+                previous = school
+            data.append(school)
+
+    return data
+
+
+def get_pending_schools(filters):
+    """Pending qty per school, ordered by zone and pincode"""
+    conditions = []
+
+    if filters.get("due_by"):
+        conditions.append("AND bsdi.expected_return_date <= %(due_by)s")
+
+    if filters.get("area_zone"):
+        conditions.append("AND s.area_zone = %(area_zone)s")
+
+    return frappe.db.sql("""
+        SELECT
+            bsd.school,
+            s.school_name,
+            s.area_zone,
+            s.pincode,
+            s.latitude,
+            s.longitude,
+            SUM(bsdi.qty - COALESCE(bsdi.qty_collected, 0)) as qty_pending,
+            COUNT(DISTINCT bsd.name) as distributions,
+            MIN(bsdi.expected_return_date) as expected_return_date
+        FROM `tabBook Sample Distribution` bsd
+        INNER JOIN `tabBook Sample Distribution Item` bsdi ON bsdi.parent = bsd.name
+        INNER JOIN `tabSchool` s ON s.name = bsd.school
+        WHERE bsd.docstatus = 1
+        AND bsd.status IN ('Distributed', 'Partially Collected')
+        AND bsdi.qty > COALESCE(bsdi.qty_collected, 0)
+        {conditions}
+        GROUP BY bsd.school
+        ORDER BY s.area_zone, s.pincode, qty_pending DESC
+    """.format(conditions=" ".join(conditions)), filters, as_dict=True)
+
+
+def get_available_vehicles(filters):
+    """Active vehicles with a capacity set, most free space first"""
+    conditions = "AND name = %(vehicle)s" if filters.get("vehicle") else ""
+    vehicles = frappe.db.sql("""
+        SELECT
+            name,
+            capacity_books,
+            COALESCE(books_on_board, 0) as books_on_board,
+            capacity_books - COALESCE(books_on_board, 0) as free_capacity
+        FROM `tabVehicle`
+        WHERE is_active = 1
+        AND capacity_books > 0
+        {conditions}
+        ORDER BY free_capacity DESC
+    """.format(conditions=conditions), filters, as_dict=True)
+
+    return OrderedDict((vehicle.name, vehicle) for vehicle in vehicles if vehicle.free_capacity > 0)
+
+
+def assign_vehicles(schools, vehicles):
+    """Fill vans in turn with schools in zone and pincode order.
+
+    A school that does not fit the current van goes to the next van with
+    room for it, and planning moves on to that van, so each van gets a run of
+    neighbouring pincodes. Failing that it goes to any van with room left.
+    Schools that fit no van are returned under None.
+    """
+    plan = OrderedDict((vehicle, []) for vehicle in vehicles)
+    vans = list(vehicles.values())
+    remaining = [flt(van.free_capacity) for van in vans]
+    unassigned = []
+
+    current = 0
+    for school in schools:
+        qty = flt(school.qty_pending)
+        if current < len(vans) and qty <= remaining[current]:
+            index = current
+        else:
+            index = next((i for i in range(current + 1, len(vans)) if qty <= remaining[i]), None)
+            if index is not None and remaining[current] < flt(vans[current].free_capacity):
+                current = index
+            elif index is None:
+                index = next((i for i in range(len(vans)) if qty <= remaining[i]), None)
+
+        if index is None:
+            unassigned.append(school)
+            continue
+
+        plan[vans[index].name].append(school)
+        remaining[index] -= qty
+
+    if unassigned:
+        plan[None] = unassigned
+
+    return plan
+
+
+def order_stops(stops):
+    """Order a van's stops by nearest neighbour, first between pincodes then within each.
+
+    Working on pincode clusters keeps the heuristic fast for large plans.
+    Stops without coordinates go last within their pincode.
+    """
+    clusters = OrderedDict()
+    for school in stops:
+        clusters.setdefault((school.area_zone, school.pincode), []).append(school)
+
+    centroids = []
+    for key, schools in clusters.items():
+        located = [school for school in schools if has_coordinates(school)]
+        centroids.append(frappe._dict({
+            "key": key,
+            "latitude": sum(flt(s.latitude) for s in located) / len(located) if located else None,
+            "longitude": sum(flt(s.longitude) for s in located) / len(located) if located else None,
+        }))
+
+    ordered = []
+    position = None
+    for centroid in nearest_neighbour_order(centroids):
+        schools = clusters[centroid.key]
+        route = nearest_neighbour_order(schools, position)
+        ordered.extend(route)
+
+        located = [school for school in route if has_coordinates(school)]
+        if located:
+            position = located[-1]
+
+    return ordered
+
+
+def nearest_neighbour_order(points, start=None):
+    """Order points greedily by nearest next point; points without coordinates keep their order at the end.
+
+    Comparisons use an equirectangular projection, which ranks distances the
+    same as the great circle at city scale and is much cheaper to compute.
+    """
+    located = [point for point in points if has_coordinates(point)]
+    if not located:
+        return list(points)
+
+    scale = math.cos(math.radians(sum(flt(point.latitude) for point in located) / len(located)))
+    pending = [(flt(point.longitude) * scale, flt(point.latitude), point) for point in located]
+
+    if start and has_coordinates(start):
+        x, y = flt(start.longitude) * scale, flt(start.latitude)
+    else:
+        x, y = pending[0][0], pending[0][1]
+
+    ordered = []
+    while pending:
+        nearest, nearest_distance = 0, math.inf
+        for i, candidate in enumerate(pending):
+            distance = (candidate[0] - x) ** 2 + (candidate[1] - y) ** 2
+            if distance < nearest_distance:
+                nearest, nearest_distance = i, distance
+
+        x, y, point = pending[nearest]
+        pending[nearest] = pending[-1]
+        pending.pop()
+        ordered.append(point)
+
+    return ordered + [point for point in points if not has_coordinates(point)]
+
+
+def has_coordinates(point):
+    # Float fields are 0 when not set
+    return bool(flt(point.latitude) or flt(point.longitude))
+
+
+def get_distance(origin, destination):
+    """Great-circle distance in km between two points, None when either has no coordinates"""
+    if not origin or not has_coordinates(origin) or not has_coordinates(destination):
+        return None
+
+    lat1, lon1 = math.radians(flt(origin.latitude)), math.radians(flt(origin.longitude))
+    lat2, lon2 = math.radians(flt(destination.latitude)), math.radians(flt(destination.longitude))
+
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1 @@
+# Van Stock Reconciliation Report
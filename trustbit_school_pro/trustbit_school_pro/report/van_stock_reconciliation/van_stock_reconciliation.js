@@ -0,0 +1,41 @@
+// Copyright (c) 2024, Trustbit Software and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Van Stock Reconciliation"] = {
+    "filters": [
+        {
+            "fieldname": "vehicle",
+            "label": __("Vehicle"),
+            "fieldtype": "Link",
+            "options": "Vehicle"
+        },
+        {
+            "fieldname": "item_code",
+            "label": __("Book"),
+            "fieldtype": "Link",
+            "options": "Item",
+            "get_query": function() {
+                return {
+                    filters: {
+                        "custom_is_sample_book": 1
+                    }
+                };
+            }
+        },
+        {
+            "fieldname": "show_all",
+            "label": __("Show Matching Rows"),
+            "fieldtype": "Check",
+            "default": 0
+        }
+    ],
+    "formatter": function(value, row, column, data, default_formatter) {
+        value = default_formatter(value, row, column, data);
+
+        if (column.fieldname == "difference" && data.difference) {
+            value = "<span style='color:red; font-weight:bold'>" + value + "</span>";
+        }
+
+        return value;
+    }
+};
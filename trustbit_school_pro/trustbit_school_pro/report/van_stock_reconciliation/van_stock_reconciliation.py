@@ -0,0 +1,247 @@
+# Copyright (c) 2024, Trustbit Software and contributors
+# For license information, please see license.txt
+
+from collections import defaultdict
+
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from trustbit_school_pro.metrics import timed
+
+MOVEMENT_FIELDS = ("qty_loaded", "qty_distributed", "qty_collected", "qty_archived")
+
+
+@timed("trustbit_report_duration_seconds", report="van_stock_reconciliation")
+def execute(filters=None):
+    filters = frappe._dict(filters or {})
+    columns = get_columns()
+    data = get_data(filters)
+    return columns, data
+
+
+def get_columns():
+    return [
+        {
+            "fieldname": "vehicle",
+            "label": _("Vehicle"),
+            "fieldtype": "Link",
+            "options": "Vehicle",
+            "width": 120
+        },
+        {
+            "fieldname": "warehouse",
+            "label": _("Warehouse"),
+            "fieldtype": "Link",
+            "options": "Warehouse",
+            "width": 150
+        },
+        {
+            "fieldname": "item_code",
+            "label": _("Book"),
+            "fieldtype": "Link",
+            "options": "Item",
+            "width": 150
+        },
+        {
+            "fieldname": "item_name",
+            "label": _("Book Name"),
+            "fieldtype": "Data",
+            "width": 150
+        },
+        {
+            "fieldname": "qty_loaded",
+            "label": _("Loaded"),
+            "fieldtype": "Float",
+            "width": 80
+        },
+        {
+            "fieldname": "qty_distributed",
+            "label": _("Dist"),
+            "fieldtype": "Float",
+            "width": 70
+        },
+        {
+            "fieldname": "qty_collected",
+            "label": _("Coll"),
+            "fieldtype": "Float",
+            "width": 70
+        },
+        {
+            "fieldname": "qty_archived",
+            "label": _("Archived"),
+            "fieldtype": "Float",
+            "width": 80
+        },
+        {
+            "fieldname": "expected_qty",
+            "label": _("Expected"),
+            "fieldtype": "Float",
+            "width": 90
+        },
+        {
+            "fieldname": "actual_qty",
+            "label": _("In Bin"),
+            "fieldtype": "Float",
+            "width": 80
+        },
+        {
+            "fieldname": "difference",
+            "label": _("Difference"),
+            "fieldtype": "Float",
+            "width": 90
+        }
+    ]
+
+
+def get_data(filters):
+    """Compare each van's expected stock per book with its warehouse Bin.
+
+    Every source is aggregated per (vehicle, item) in the database, so the
+    report reads one row per van and title whatever the document volume.
+    """
+    conditions = get_conditions(filters)
+    rows = defaultdict(lambda: frappe._dict({field: 0.0 for field in MOVEMENT_FIELDS}))
+
+    for field, movements in (
+        ("qty_loaded", get_loading_movements(conditions, filters)),
+        ("qty_distributed", get_distribution_movements(conditions, filters)),
+        ("qty_collected", get_collection_movements(conditions, filters)),
+        ("qty_archived", get_archived_movements(conditions, filters)),
+    ):
+        for row in movements:
+            rows[(row.vehicle, row.item_code)][field] += flt(row.qty)
+
+    for row in get_bin_qty(conditions, filters):
+        rows[(row.vehicle, row.item_code)].actual_qty = flt(row.actual_qty)
+
+    if not rows:
+        return []
+
+    vehicles = dict(frappe.db.sql("""
+        SELECT name, warehouse FROM `tabVehicle` WHERE name IN %(vehicles)s
+    """, {"vehicles": tuple({vehicle for vehicle, item_code in rows})}))
+    item_names = dict(frappe.db.sql("""
+        SELECT name, item_name FROM `tabItem` WHERE name IN %(items)s
+    """, {"items": tuple({item_code for vehicle, item_code in rows})}))
+
+    data = []
+    for (vehicle, item_code), row in sorted(rows.items()):
+        row.expected_qty = row.qty_loaded - row.qty_distributed + row.qty_collected + row.qty_archived
+        row.actual_qty = flt(row.get("actual_qty"))
+        row.difference = flt(row.actual_qty - row.expected_qty, 3)
+
+        if not row.difference and not filters.get("show_all"):
+            continue
+
+        row.update({
+            "vehicle": vehicle,
+            "warehouse": vehicles.get(vehicle),
+            "item_code": item_code,
+            "item_name": item_names.get(item_code),
+        })
+        data.append(row)
+
+    return data
+
+
+def get_loading_movements(conditions, filters):
+    """Net books loaded into each van, less loadings out of it"""
+    return frappe.db.sql("""
+        SELECT
+            v.name as vehicle,
+            bsli.item_code,
+            SUM(IF(bsl.target_warehouse = v.warehouse, bsli.qty, -bsli.qty)) as qty
+        FROM `tabBook Sample Loading` bsl
+        INNER JOIN `tabBook Sample Loading Item` bsli ON bsli.parent = bsl.name
+        INNER JOIN `tabVehicle` v ON v.warehouse IN (bsl.source_warehouse, bsl.target_warehouse)
+        WHERE bsl.docstatus = 1
+        {conditions}
+        GROUP BY v.name, bsli.item_code
+    """.format(conditions=conditions.replace("{item}", "bsli.item_code")), filters, as_dict=True)
+
+
+def get_distribution_movements(conditions, filters):
+    """Net books distributed out of each van, less distributions into it"""
+    return frappe.db.sql("""
+        SELECT
+            v.name as vehicle,
+            bsdi.item_code,
+            SUM(IF(bsd.source_warehouse = v.warehouse, bsdi.qty, -bsdi.qty)) as qty
+        FROM `tabBook Sample Distribution` bsd
+        INNER JOIN `tabBook Sample Distribution Item` bsdi ON bsdi.parent = bsd.name
+        INNER JOIN `tabVehicle` v ON v.warehouse IN (bsd.source_warehouse, bsd.target_warehouse)
+        WHERE bsd.docstatus = 1
+        {conditions}
+        GROUP BY v.name, bsdi.item_code
+    """.format(conditions=conditions.replace("{item}", "bsdi.item_code")), filters, as_dict=True)
+
+
+def get_collection_movements(conditions, filters):
+    """Net books collected into each van, less collected, damaged and lost books taken out of it"""
+    return frappe.db.sql("""
+        SELECT
+            v.name as vehicle,
+            bsci.item_code,
+            SUM(
+                IF(bsc.target_warehouse = v.warehouse, COALESCE(bsci.qty_collected, 0), 0)
+                - IF(bsc.source_warehouse = v.warehouse,
+                    COALESCE(bsci.qty_collected, 0) + COALESCE(bsci.qty_damaged, 0) + COALESCE(bsci.qty_lost, 0), 0)
+            ) as qty
+        FROM `tabBook Sample Collection` bsc
+        INNER JOIN `tabBook Sample Collection Item` bsci ON bsci.parent = bsc.name
+        INNER JOIN `tabVehicle` v ON v.warehouse IN (bsc.source_warehouse, bsc.target_warehouse)
+        WHERE bsc.docstatus = 1
+        {conditions}
+        GROUP BY v.name, bsci.item_code
+    """.format(conditions=conditions.replace("{item}", "bsci.item_code")), filters, as_dict=True)
+
+
+def get_archived_movements(conditions, filters):
+    """Net van movement of archived seasons, signed like the live documents' movements"""
+    return frappe.db.sql("""
+        SELECT
+            v.name as vehicle,
+            ae.item_code,
+            SUM(CASE ae.voucher_type
+                WHEN 'Book Sample Loading' THEN
+                    IF(ae.target_warehouse = v.warehouse, ae.qty_loaded, -ae.qty_loaded)
+                WHEN 'Book Sample Distribution' THEN
+                    IF(ae.source_warehouse = v.warehouse, -ae.qty_distributed, ae.qty_distributed)
+                ELSE
+                    IF(ae.target_warehouse = v.warehouse, COALESCE(ae.qty_collected, 0), 0)
+                    - IF(ae.source_warehouse = v.warehouse,
+                        COALESCE(ae.qty_collected, 0) + COALESCE(ae.qty_damaged, 0) + COALESCE(ae.qty_lost, 0), 0)
+            END) as qty
+        FROM `tabBook Sample Archive Entry` ae
+        INNER JOIN `tabVehicle` v ON v.warehouse IN (ae.source_warehouse, ae.target_warehouse)
+        WHERE ae.is_balance = 0
+        {conditions}
+        GROUP BY v.name, ae.item_code
+    """.format(conditions=conditions.replace("{item}", "ae.item_code")), filters, as_dict=True)
+
+
+def get_bin_qty(conditions, filters):
+    """Current stock of each van warehouse"""
+    return frappe.db.sql("""
+        SELECT
+            v.name as vehicle,
+            b.item_code,
+            b.actual_qty
+        FROM `tabVehicle` v
+        INNER JOIN `tabBin` b ON b.warehouse = v.warehouse
+        WHERE b.actual_qty != 0
+        {conditions}
+    """.format(conditions=conditions.replace("{item}", "b.item_code")), filters, as_dict=True)
+
+
+def get_conditions(filters):
+    conditions = []
+
+    if filters.get("vehicle"):
+        conditions.append("AND v.name = %(vehicle)s")
+
+    if filters.get("item_code"):
+        conditions.append("AND {item} = %(item_code)s")
+
+    return " ".join(conditions)
@@ -1,11 +1,26 @@
 # Copyright (c) 2024, Trustbit Software and contributors
 # For license information, please see license.txt
 
-import frappe
 from frappe import _
-from frappe.utils import flt
 
+from trustbit_school_pro.ledger import get_ledger_entries
+from trustbit_school_pro.metrics import timed
 
+# Running balance per vehicle: loaded - distributed + collected is what is on the van
+LEDGER = {
+    "qty_fields": {
+        "Book Sample Loading": "qty_loaded",
+        "Book Sample Distribution": "qty_distributed",
+        "Book Sample Collection": "qty_collected",
+    },
+    "signs": {"qty_loaded": 1, "qty_distributed": -1, "qty_collected": 1},
+    "balance_key": ("vehicle",),
+    "order_by": ("date", "voucher_no"),
+    "party_field": "driver_name",
+}
+
+
+@timed("trustbit_report_duration_seconds", report="vehicle_sample_ledger")
 def execute(filters=None):
     columns = get_columns()
     data = get_data(filters)
@@ -101,136 +116,4 @@ def get_columns():
 
 
 def get_data(filters):
-    conditions = get_conditions(filters)
-    data = []
-
-    # Get Loading entries (books loaded to van)
-    loading_data = frappe.db.sql("""
-        SELECT
-            bsl.loading_date as date,
-            'Book Sample Loading' as voucher_type,
-            bsl.name as voucher_no,
-            bsl.vehicle,
-            bsl.loader_name as driver_name,
-            NULL as school,
-            bsli.item_code,
-            bsli.item_name,
-            bsli.qty as qty_loaded,
-            0 as qty_distributed,
-            0 as qty_collected,
-            bsl.source_warehouse as warehouse
-        FROM `tabBook Sample Loading` bsl
-        INNER JOIN `tabBook Sample Loading Item` bsli ON bsli.parent = bsl.name
-        WHERE bsl.docstatus = 1
-        {conditions}
-        ORDER BY bsl.loading_date, bsl.creation
-    """.format(conditions=conditions.get("loading", "")), filters, as_dict=True)
-
-    # Get Distribution entries (books distributed to school)
-    distribution_data = frappe.db.sql("""
-        SELECT
-            bsd.distribution_date as date,
-            'Book Sample Distribution' as voucher_type,
-            bsd.name as voucher_no,
-            bsd.vehicle,
-            bsd.distributor_name as driver_name,
-            bsd.school,
-            bsdi.item_code,
-            bsdi.item_name,
-            0 as qty_loaded,
-            bsdi.qty as qty_distributed,
-            0 as qty_collected,
-            bsd.source_warehouse as warehouse
-        FROM `tabBook Sample Distribution` bsd
-        INNER JOIN `tabBook Sample Distribution Item` bsdi ON bsdi.parent = bsd.name
-        WHERE bsd.docstatus = 1
-        {conditions}
-        ORDER BY bsd.distribution_date, bsd.creation
-    """.format(conditions=conditions.get("distribution", "")), filters, as_dict=True)
-
-    # Get Collection entries (books collected from school)
-    # Note: Book Sample Collection doesn't have vehicle field
-    collection_data = frappe.db.sql("""
-        SELECT
-            bsc.collection_date as date,
-            'Book Sample Collection' as voucher_type,
-            bsc.name as voucher_no,
-            NULL as vehicle,
-            bsc.collector_name as driver_name,
-            bsc.school,
-            bsci.item_code,
-            bsci.item_name,
-            0 as qty_loaded,
-            0 as qty_distributed,
-            bsci.qty_collected as qty_collected,
-            bsc.target_warehouse as warehouse
-        FROM `tabBook Sample Collection` bsc
-        INNER JOIN `tabBook Sample Collection Item` bsci ON bsci.parent = bsc.name
-        WHERE bsc.docstatus = 1
-        AND bsci.qty_collected > 0
-        {conditions}
-        ORDER BY bsc.collection_date, bsc.creation
-    """.format(conditions=conditions.get("collection", "")), filters, as_dict=True)
-
-    # Combine all data
-    all_data = loading_data + distribution_data + collection_data
-
-    # Sort by date
-    all_data.sort(key=lambda x: (x.get("date") or "", x.get("voucher_no") or ""))
-
-    # Calculate running balance per vehicle
-    # Balance = Loaded - Distributed + Collected (books currently in vehicle)
-    vehicle_balances = {}
-    for row in all_data:
-        vehicle = row.get("vehicle")
-        if vehicle not in vehicle_balances:
-            vehicle_balances[vehicle] = 0
-
-        qty_loaded = flt(row.get("qty_loaded", 0))
-        qty_distributed = flt(row.get("qty_distributed", 0))
-        qty_collected = flt(row.get("qty_collected", 0))
-
-        # Loaded adds to vehicle, distributed removes, collected adds back
-        vehicle_balances[vehicle] += qty_loaded - qty_distributed + qty_collected
-        row["balance"] = vehicle_balances[vehicle]
-        data.append(row)
-
-    return data
-
-
-def get_conditions(filters):
-    conditions = {
-        "loading": [],
-        "distribution": [],
-        "collection": []
-    }
-
-    if filters.get("from_date"):
-        conditions["loading"].append("AND bsl.loading_date >= %(from_date)s")
-        conditions["distribution"].append("AND bsd.distribution_date >= %(from_date)s")
-        conditions["collection"].append("AND bsc.collection_date >= %(from_date)s")
-
-    if filters.get("to_date"):
-        conditions["loading"].append("AND bsl.loading_date <= %(to_date)s")
-        conditions["distribution"].append("AND bsd.distribution_date <= %(to_date)s")
-        conditions["collection"].append("AND bsc.collection_date <= %(to_date)s")
-
-    if filters.get("vehicle"):
-        conditions["loading"].append("AND bsl.vehicle = %(vehicle)s")
-        conditions["distribution"].append("AND bsd.vehicle = %(vehicle)s")
-        # Note: Book Sample Collection doesn't have vehicle field
-
-    if filters.get("item_code"):
-        conditions["loading"].append("AND bsli.item_code = %(item_code)s")
-        conditions["distribution"].append("AND bsdi.item_code = %(item_code)s")
-        conditions["collection"].append("AND bsci.item_code = %(item_code)s")
-
-    if filters.get("school"):
-        conditions["distribution"].append("AND bsd.school = %(school)s")
-        conditions["collection"].append("AND bsc.school = %(school)s")
-
-    return {
-        "loading": " ".join(conditions["loading"]),
-        "distribution": " ".join(conditions["distribution"]),
-        "collection": " ".join(conditions["collection"])
-    }
+    return get_ledger_entries(LEDGER, filters)